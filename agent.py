@@ -1,12 +1,12 @@
 """
 ReAct loop for the Job Assistant.
 """
-from typing import Callable, Dict, Any
+import contextvars, queue
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Any, Optional
+from listing import summarize
 from planner import generate_tasks
-import tools
-from typing import Callable, Dict, Any
-from planner import generate_tasks
-import tools
+import results, telemetry, tools
 
 
 def parse_resume(resume_md):
@@ -74,34 +74,164 @@ def parse_cover_letter(cover_md):
     return sections
 
 
-def run_agent(job_title: str, log: Callable[[str], None] = print):
+def task_dependencies(tasks):
+    """Map each task index to the indexes of the tasks it has to wait for."""
+    producers = {}
+    for i, task in enumerate(tasks):
+        for key in task.get("outputs", [task["tool"]]):
+            producers[key] = i
+
+    deps = {}
+    for i, task in enumerate(tasks):
+        if "inputs" not in task:
+            # undeclared tasks keep the old behaviour and wait for the previous step
+            deps[i] = {i - 1} if i else set()
+            continue
+        # inputs nobody produces (e.g. location) are just read from memory if present
+        deps[i] = {producers[k] for k in task["inputs"] if k in producers and producers[k] != i}
+    return deps
+
+
+def format_event(event: Dict[str, Any]) -> list:
+    """Trace lines for an agent event (this is what the `log` hook receives)."""
+    if event["type"] == "plan":
+        return [f"PLAN: Generating tasks for → {event['goal']}"]
+    if event["type"] == "step":
+        span = event.get("span") or {}
+        timing = f" ({span['duration_ms'] / 1000:.1f}s{', cached' if span.get('cache_hit') else ''})" \
+            if span.get("duration_ms") is not None else ""
+        return [f"\nTHOUGHT: {event['thought']}", f"OBSERVE{timing}: {event['observe']}"]
+    if event["type"] == "finish":
+        return [f"\nFINISH. ({event['span']['duration_ms'] / 1000:.1f}s)"]
+    return []
+
+
+def run_agent(job_title: str, log: Optional[Callable[[str], None]] = print, max_workers: int = 4,
+              stream: Optional[Callable[[str, str], None]] = None,
+              on_event: Optional[Callable[[Dict[str, Any]], None]] = None, cached: bool = True,
+              use_cache: bool = True):
     """
     Run the agent to generate job search materials
-    
+
+    Tasks run as soon as the tasks they depend on are done, so the searches
+    overlap with the LLM calls. If `stream` is given, resume and cover text is
+    streamed to it as (tool, chunk) while it is generated.
+
+    Progress is reported as structured events to `on_event`: plan, a result
+    event as soon as each tool finishes, one step per task in plan order with
+    its timing span, and finish. `log` gets the same events as THOUGHT/OBSERVE
+    text. All hooks are only ever called from the calling thread.
+
+    Finished results go into `results.store`; with `cached` a fresh stored
+    result for the same goal is returned straight away instead of running
+    the tools again. `use_cache=False` (an explicit refresh) also skips the
+    tools' own caches, so every upstream is asked again.
+
     Returns:
-        Dict with keys: 'jobs', 'posts', 'resume', 'cover'
+        Dict with keys: 'jobs', 'posts', 'resume', 'cover', plus 'resume_sections'
+        and 'cover_sections' when the structured (bundle) path produced them
     """
-    log(f"PLAN: Generating tasks for → {job_title}")
+    def emit(event):
+        if on_event is not None:
+            on_event(event)
+        if log is not None:
+            for line in format_event(event):
+                log(line)
+
+    with telemetry.span("agent", goal=job_title) as agent_span:
+        entry = results.store.get_entry(job_title) if cached and use_cache else None
+        if entry is None:
+            result = _run_tasks(job_title, emit, stream, max_workers, use_cache)
+            # failed generations aren't kept, the next request tries again
+            if not results.failed(result):
+                results.store.put(job_title, result)
+        else:
+            telemetry.record(cache_hit=True)
+            result, age = entry
+            emit({"type": "plan", "goal": job_title, "tools": ["store"]})
+            for tool in ("jobs", "posts", "resume", "cover"):
+                emit({"type": "result", "tool": tool, "output": result[tool],
+                      "sections": result.get(f"{tool}_sections"), "span": None})
+            emit({"type": "step", "tool": "store", "thought": "Reuse results prepared for this goal",
+                  "observe": f"served from the result store ({age / 60:.0f} min old)", "span": None})
+
+    emit({"type": "finish", "goal": job_title, "span": agent_span})
+    return result
+
+
+def _run_tasks(job_title, emit, stream, max_workers, use_cache=True):
+    """Plan the goal and run its tools, reporting through emit(); returns the result dict."""
     tasks = generate_tasks(job_title)
+    emit({"type": "plan", "goal": job_title, "tools": [t["tool"] for t in tasks]})
+    deps = task_dependencies(tasks)
     memory: Dict[str, Any] = {}
 
-    for task in tasks:
-        log(f"\nTHOUGHT: {task['thought']}")
-        output = tools.use_tool(task["tool"], memory=memory, goal=job_title)
-        
-        # store output with consistent keys for app.py
-        tool_name = task["tool"]
-        memory[tool_name] = output
-        
-        log(f"OBSERVE: {str(output)[:600]}")
+    # workers report tokens, spans and results here, the loop below hands them to the hooks
+    events: queue.Queue = queue.Queue()
+
+    def run_task(i):
+        tool_name = tasks[i]["tool"]
+        on_token = (lambda chunk: events.put(("token", tool_name, chunk))) if stream else None
+        try:
+            with telemetry.listening(lambda span: events.put(("span", i, span))):
+                output = tools.use_tool(tool_name, memory=memory, goal=job_title, on_token=on_token,
+                                        use_cache=use_cache)
+            events.put(("done", i, output))
+        except Exception as e:
+            events.put(("error", i, e))
+
+    pending = list(range(len(tasks)))
+    running = set()
+    outputs = {}
+    spans = {}
+    next_log = 0
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while pending or running:
+            # start every task whose dependencies are finished
+            for i in [i for i in pending if deps[i] <= outputs.keys()]:
+                pending.remove(i)
+                running.add(i)
+                # each task gets its own context so span listeners don't leak between tasks
+                pool.submit(contextvars.copy_context().run, run_task, i)
+
+            if not running:
+                raise ValueError(f"Task dependencies can't be resolved: {[tasks[i]['tool'] for i in pending]}")
+
+            kind, ref, value = events.get()
+            if kind == "token":
+                stream(ref, value)
+                continue
+            if kind == "span":
+                if value["name"] == "tool":
+                    spans[ref] = value
+                continue
+
+            running.discard(ref)
+            if kind == "error":
+                raise value
+
+            # store output with consistent keys for app.py
+            tool_name = tasks[ref]["tool"]
+            memory[tool_name] = value
+            outputs[ref] = value
+
+            # publish the result right away so the UI can show it before the rest finishes
+            emit({"type": "result", "tool": tool_name, "output": value, "span": spans.get(ref)})
+
+            # report finished tasks in plan order so the trace reads the same every run
+            while next_log in outputs:
+                task = tasks[next_log]
+                emit({"type": "step", "tool": task["tool"], "thought": task["thought"],
+                      "observe": summarize(outputs[next_log]), "span": spans.get(next_log)})
+                next_log += 1
 
     # map tool outputs to expected keys for app.py
-    result = {
+    return {
         "jobs": memory.get("jobs", []),
         "posts": memory.get("posts", []),
         "resume": memory.get("resume", ""),
         "cover": memory.get("cover", ""),
+        "resume_sections": memory.get("resume_sections"),
+        "cover_sections": memory.get("cover_sections"),
     }
-
-    log("\nFINISH.")
-    return result
\ No newline at end of file
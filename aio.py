@@ -0,0 +1,114 @@
+"""
+Shared asyncio loop and pooled keep-alive HTTP clients for the search tools.
+
+Sync code hands coroutines to one background event loop with `run`, so every
+search in the process shares the same connection pools instead of opening a
+new TCP+TLS connection per request.
+"""
+from __future__ import annotations
+import asyncio, concurrent.futures, contextvars, os, threading, weakref
+from urllib.parse import urlsplit
+import httpx
+
+# connection limits and timeouts for new clients, override with configure()
+settings = {
+    "max_connections": int(os.getenv("HTTP_MAX_CONNECTIONS", 20)),      # per host
+    "max_keepalive": int(os.getenv("HTTP_MAX_KEEPALIVE", 10)),          # idle sockets kept per host
+    "keepalive_expiry": float(os.getenv("HTTP_KEEPALIVE_EXPIRY", 30)),  # seconds
+    "timeout": float(os.getenv("HTTP_TIMEOUT", 10)),
+    "connect_timeout": float(os.getenv("HTTP_CONNECT_TIMEOUT", 5)),
+}
+
+_loop: asyncio.AbstractEventLoop | None = None
+_thread: threading.Thread | None = None
+_lock = threading.Lock()
+
+# loop -> {host: client}; httpx clients can't be shared between event loops
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict]" = weakref.WeakKeyDictionary()
+
+
+def configure(**options):
+    """Change pool limits/timeouts. Only clients created afterwards pick them up."""
+    unknown = set(options) - set(settings)
+    if unknown:
+        raise ValueError(f"Unknown HTTP settings: {sorted(unknown)}")
+    settings.update(options)
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """Start (once) and return the background event loop."""
+    global _loop, _thread
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            _thread = threading.Thread(target=_loop.run_forever, name="aio-loop", daemon=True)
+            _thread.start()
+        return _loop
+
+
+def run(coro, timeout: float | None = None):
+    """Run a coroutine on the background loop and block until it finishes."""
+    loop = get_loop()
+    if threading.current_thread() is _thread:
+        coro.close()
+        raise RuntimeError("aio.run() called from the background loop, await the coroutine instead")
+
+    # run the task in a copy of the caller's context so context variables
+    # (e.g. the current telemetry span) carry over to the loop thread
+    ctx = contextvars.copy_context()
+    result = concurrent.futures.Future()
+
+    def done(task):
+        if task.cancelled():
+            result.cancel()
+        elif task.exception() is not None:
+            result.set_exception(task.exception())
+        else:
+            result.set_result(task.result())
+
+    loop.call_soon_threadsafe(lambda: loop.create_task(coro, context=ctx).add_done_callback(done))
+    return result.result(timeout)
+
+
+def iterate(agen):
+    """Drive an async generator on the background loop from sync code."""
+    async def step():
+        return await agen.__anext__()
+
+    async def close():
+        await agen.aclose()
+
+    try:
+        while True:
+            try:
+                yield run(step())
+            except StopAsyncIteration:
+                return
+    finally:
+        run(close())
+
+
+def get_client(url: str) -> httpx.AsyncClient:
+    """Pooled keep-alive client for the url's host on the running loop."""
+    loop = asyncio.get_running_loop()
+    host = urlsplit(url).netloc
+    per_loop = _clients.setdefault(loop, {})
+    client = per_loop.get(host)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings["max_connections"],
+                max_keepalive_connections=settings["max_keepalive"],
+                keepalive_expiry=settings["keepalive_expiry"],
+            ),
+            timeout=httpx.Timeout(settings["timeout"], connect=settings["connect_timeout"]),
+        )
+        per_loop[host] = client
+    return client
+
+
+async def aclose():
+    """Close the clients that belong to the running loop."""
+    per_loop = _clients.pop(asyncio.get_running_loop(), {})
+    for client in per_loop.values():
+        await client.aclose()
@@ -3,7 +3,10 @@ from dotenv import load_dotenv
 from agent import run_agent
 from agent import parse_resume
 from agent import parse_cover_letter
-import re
+from agent import format_event
+from listing import JobListing
+import os, time
+import prefetch, results, retriever, telemetry, tools, worker
 
 load_dotenv()
 
@@ -11,56 +14,34 @@ load_dotenv()
 st.set_page_config(page_title="Job Assistant", layout="wide")
 st.title("AI Job Assistant")
 
-def clean_text(text):
-    if not isinstance(text, str):
-        return text
-    text = text.replace('\n', ' ').replace('\r', ' ') # replaces \n and \r with space
-    text = re.sub(r'\s+', ' ', text) # replaces multiple spaces with a single space
-    return text.strip()
-
-job = st.text_input("🔎︎ Desired Job Title", placeholder="e.g., Data Analyst, Software Engineer")
-
-if st.button("Generate") and job.strip():
-    trace = st.empty()
-    buf = []
-
-    def logger(line):
-        buf.append(line)
-        trace.text_area("Agent Trace", "\n".join(buf), height=300)
-
-    memory = run_agent(job, log=logger)
-
-    st.success("Job search completed! Here are the results:")
-    
-    # JOB LISTINGS
-    if "jobs" in memory and memory["jobs"]:
+def render_jobs(jobs):
+    # JOB LISTINGS (fields were cleaned when the listings came in)
+    if jobs:
         st.markdown("## 🔎︎ Job Listings")
-        for i, job_item in enumerate(memory["jobs"]):
-            title = clean_text(job_item['title'])
-            company = clean_text(job_item['company'])
-            location = clean_text(job_item['location'])
-            salary = clean_text(job_item.get('salary', ''))
-            description = clean_text(job_item['description'][:300] + "...")
+        for i, job_item in enumerate(jobs):
+            job_item = JobListing.from_dict(job_item)
             
-            with st.expander(f"{i+1}. {title} at {company}"):
-                st.markdown(f"### {title}", unsafe_allow_html=True) 
-                st.write(f"**Company:** {company}")
-                st.write(f"**Location:** {location}")
-                if job_item.get('date_posted'):
-                    st.write(f"**Posted:** {job_item['date_posted']}")
-                if salary:
-                    st.write(f"**Salary:** {salary}")
-                st.write(description)
-                if job_item.get('url'):
-                    st.markdown(f"[🔗 Apply Here]({job_item['url']})")
-    
+            with st.expander(f"{i+1}. {job_item.title} at {job_item.company}"):
+                st.markdown(f"### {job_item.title}", unsafe_allow_html=True) 
+                st.write(f"**Company:** {job_item.company}")
+                st.write(f"**Location:** {job_item.location}")
+                if job_item.date_posted:
+                    st.write(f"**Posted:** {job_item.date_posted}")
+                if job_item.salary:
+                    st.write(f"**Salary:** {job_item.salary}")
+                st.write(job_item.excerpt)
+                if job_item.url:
+                    st.markdown(f"[🔗 Apply Here]({job_item.url})")
+
+
+def render_posts(posts, job):
     # NEWS AND ARTICLES
-    if "posts" in memory and memory["posts"]:
+    if posts:
         st.markdown("---")
         st.markdown("## 📰 Industry News & Career Resources")
         st.caption(f"Recent articles and resources related to {job}")
         
-        for i, post in enumerate(memory["posts"], 1):
+        for i, post in enumerate(posts, 1):
             with st.container():
                 col1, col2 = st.columns([1, 20])
                 
@@ -83,27 +64,37 @@ if st.button("Generate") and job.strip():
     else:
         st.info("💡 No news articles found. Try enabling Google Custom Search API.")
 
+
+def resume_contact_lines(resume):
+    # Extract contact info
+    contact_lines = []
+    for line in resume.splitlines():
+        if line.strip().startswith("##"):
+            break
+        if line.strip().lower() in {"summary", "key skills", "experience", "education", "---"}:
+            continue
+        if line.strip():
+            contact_lines.append(line.strip().replace("#", "").strip())
+    
+    # Remove code block markers
+    if contact_lines and contact_lines[0].startswith("```"):
+        contact_lines[0] = contact_lines[0].replace("```markdown", "").replace("```", "").strip()
+    if contact_lines and contact_lines[-1].endswith("```"):
+        contact_lines[-1] = contact_lines[-1].replace("```", "").strip()
+    return contact_lines
+
+
+def render_resume(resume, sections=None):
     # RESUME
     st.markdown("\n\n")
-    if "resume" in memory and memory["resume"]:
+    if resume:
         st.markdown("## 📄 Sample Resume")
-        resume_sections = parse_resume(memory["resume"])
-        
-        # Extract contact info
-        contact_lines = []
-        for line in memory["resume"].splitlines():
-            if line.strip().startswith("##"):
-                break
-            if line.strip().lower() in {"summary", "key skills", "experience", "education", "---"}:
-                continue
-            if line.strip():
-                contact_lines.append(line.strip().replace("#", "").strip())
-        
-        # Remove code block markers
-        if contact_lines and contact_lines[0].startswith("```"):
-            contact_lines[0] = contact_lines[0].replace("```markdown", "").replace("```", "").strip()
-        if contact_lines and contact_lines[-1].endswith("```"):
-            contact_lines[-1] = contact_lines[-1].replace("```", "").strip()
+        if sections:
+            # structured answer, already split into sections
+            resume_sections = sections
+            contact_lines = [sections["Contact"]] if sections.get("Contact") else []
+        else:
+            resume_sections, contact_lines = parse_resume(resume), resume_contact_lines(resume)
         
         # Display contact info
         if contact_lines:
@@ -133,36 +124,225 @@ if st.button("Generate") and job.strip():
                 education_lines = education_lines[:-1]
             st.write("\n".join(education_lines))
 
+
+def render_cover(cover, sections=None):
     # COVER LETTER
-    if "cover" in memory:
-        if memory["cover"]:
-            st.markdown("---")
-            st.markdown("## ✉️ Sample Cover Letter")
-            cover_sections = parse_cover_letter(memory["cover"])
-            
-            if cover_sections:
-                for section, content in cover_sections.items():
-                    st.markdown(f"**{section}**")
-                    st.write(content)
-                    st.write("")  # add spacing
-            else:
-                # display as plain text if parsing fails
-                st.write(memory["cover"])
+    if cover:
+        st.markdown("---")
+        st.markdown("## ✉️ Sample Cover Letter")
+        cover_sections = sections or parse_cover_letter(cover)
+        
+        if cover_sections:
+            for section, content in cover_sections.items():
+                st.markdown(f"**{section}**")
+                st.write(content)
+                st.write("")  # add spacing
         else:
-            st.warning("No cover letter was generated.")
+            # display as plain text if parsing fails
+            st.write(cover)
+    else:
+        st.warning("No cover letter was generated.")
+
+
+# AGENT_WORKERS=1 hands runs to `python worker.py` processes through the job queue
+WORKER_MODE = os.getenv("AGENT_WORKERS", "0") != "0"
+# give up when no worker has claimed the run after AGENT_CLAIM_TIMEOUT seconds (none running?),
+# or after AGENT_WAIT_TIMEOUT in all, by default long enough for every retry of a hung run
+WORKER_CLAIM_WAIT = float(os.getenv("AGENT_CLAIM_TIMEOUT", 30))
+WORKER_WAIT = float(os.getenv("AGENT_WAIT_TIMEOUT", worker.MAX_ATTEMPTS * worker.JOB_TIMEOUT + 30))
+
+# shown on the start page
+EXAMPLE_TITLES = [
+    "Software Engineer in New York",
+    "Web Design Intern in Denver, Colorado",
+    "Goodwill Cashier",
+    "Registered Nurse at AdventHealth",
+    "Entry Level Marketing Assistant",
+    "Dog Sitter",
+]
+
+# seconds between redraws of a streamed draft
+DRAFT_REDRAW = 0.15
+
+# placeholder text shown in each section until its tool finishes
+SKELETONS = {
+    "jobs": "⏳ Searching job listings...",
+    "posts": "⏳ Finding related articles...",
+    "resume": "⏳ Drafting your resume...",
+    "cover": "⏳ Drafting your cover letter...",
+}
+
+RENDERERS = {
+    "jobs": render_jobs,
+    "resume": render_resume,
+    "cover": render_cover,
+}
+
+
+def render_result(result, job):
+    """Draw a finished (stored) result without running anything."""
+    if result.get("trace"):
+        with st.expander("Agent Trace"):
+            st.text(result["trace"])
+    render_jobs(result["jobs"])
+    render_posts(result["posts"], job)
+    render_resume(result["resume"], result.get("resume_sections"))
+    render_cover(result["cover"], result.get("cover_sections"))
+
+
+def generate(job, cached=True):
+    """Run the agent, drawing each section as soon as its tool finishes (cached=False skips every cache)."""
+    trace = st.empty()
+    buf = []
+    status = st.empty()
+    status.info("⏳ Working on it, results appear below as soon as each part is ready.")
+
+    # one placeholder per section, each filled in as soon as its tool is done
+    sections = {name: st.empty() for name in SKELETONS}
+    for name, text in SKELETONS.items():
+        sections[name].caption(text)
+
+    renderers = dict(RENDERERS, posts=lambda posts: render_posts(posts, job))
+
+    def render_bundle(bundle):
+        # one structured answer fills both writing sections
+        with sections["resume"].container():
+            render_resume(bundle["resume"], bundle.get("resume_sections"))
+        with sections["cover"].container():
+            render_cover(bundle["cover"], bundle.get("cover_sections"))
+
+    # the trace and the sections are rendered from the agent's structured events
+    def on_event(event):
+        if event["type"] == "retry":
+            # the first worker timed out, start over with what the retry sends
+            buf.append(f"\nRETRY: attempt {event['attempt']}")
+            for name, text in SKELETONS.items():
+                sections[name].caption(text)
+            drafts.update(resume="", cover="")
+        elif event["type"] == "result" and event["tool"] == "bundle":
+            render_bundle(event["output"])
+        elif event["type"] == "result" and event["tool"] in renderers:
+            with sections[event["tool"]].container():
+                if event.get("sections"):
+                    renderers[event["tool"]](event["output"], event["sections"])
+                else:
+                    renderers[event["tool"]](event["output"])
+        lines = format_event(event)
+        if lines:
+            buf.extend(lines)
+            trace.text_area("Agent Trace", "\n".join(buf), height=300)
+
+    # live drafts of the resume and cover letter while they are being written
+    drafts = {"resume": "", "cover": ""}
+    drawn = {"resume": 0.0, "cover": 0.0}
+    headings = {"resume": "📄 Writing resume...", "cover": "✉️ Writing cover letter..."}
+
+    def streamer(tool, chunk):
+        drafts[tool] += chunk
+        # every redraw sends the whole draft, so not once per token; the result
+        # event replaces the draft with the finished text anyway
+        if time.monotonic() - drawn[tool] < DRAFT_REDRAW:
+            return
+        drawn[tool] = time.monotonic()
+        with sections[tool].container():
+            st.markdown(f"#### {headings[tool]}")
+            st.text(drafts[tool])
+
+    if WORKER_MODE:
+        # the agent runs in a worker process, this script only draws its events
+        job_queue = worker.JobQueue()
+        job_id = job_queue.submit(job, cached)
+        try:
+            for event in job_queue.follow(job_id, timeout=WORKER_WAIT, claim_timeout=WORKER_CLAIM_WAIT):
+                if event["type"] == "tokens":
+                    streamer(event["tool"], event["text"])
+                else:
+                    on_event(event)
+        except TimeoutError as e:
+            # nobody picked it up (or every attempt hung), don't leave it for a worker to find later
+            job_queue.cancel(job_id, f"{e}, is `python worker.py` running?")
+        state = job_queue.status(job_id)
+        if state["status"] != "done":
+            status.error(f"Generation failed: {state['error']}")
+            st.stop()
+        result = state["result"]
+    else:
+        result = run_agent(job, log=None, stream=streamer, on_event=on_event, cached=cached, use_cache=cached)
+
+    status.success("Job search completed! Here are the results:")
+    return dict(result, trace="\n".join(buf))
+
+
+# this session's own results; anything else comes from the process-wide store
+if "results" not in st.session_state:
+    st.session_state.results = results.ResultStore(max_bytes=8 * 1024 * 1024)
+session_results = st.session_state.results
+
+job = st.text_input("🔎︎ Desired Job Title", placeholder="e.g., Data Analyst, Software Engineer")
+col_generate, col_refresh, _ = st.columns([1, 1, 8])
+with col_generate:
+    generate_clicked = st.button("Generate")
+with col_refresh:
+    refresh_clicked = st.button("🔄 Refresh")
+
+if (generate_clicked or refresh_clicked) and job.strip():
+    st.session_state.current = job
+    prefetch.prefetcher.record(job)
+    stored = None if refresh_clicked else session_results.get(job)
+    if stored is None:
+        # run_agent serves results prepared in the background (or by another session) from
+        # the process-wide store; Refresh skips every cache and asks the upstreams again
+        stored = generate(job, cached=not refresh_clicked)
+    else:
+        st.caption("Showing saved results, press 🔄 Refresh to generate them again.")
+        render_result(stored, job)
+    if not results.failed(stored):
+        # a failed generation isn't saved, so the next Generate click tries again
+        session_results.put(job, stored)
+
+elif (current := st.session_state.get("current")) and (stored := session_results.get(current)) is not None:
+    # any other widget interaction reruns the script, redraw the last result instead of losing it
+    render_result(stored, current)
 
 else:
     st.info("💡 Type a job title and press **Generate** to get started.")
     
     # examples of job titles
     st.markdown("### Example Job Titles:")
-    col1, col2, col3 = st.columns(3)
-    with col1:
-        st.markdown("- Software Engineer in New York")
-        st.markdown("- Web Design Intern in Denver, Colorado")
-    with col2:
-        st.markdown("- Goodwill Cashier")
-        st.markdown("- Registered Nurse at AdventHealth")
-    with col3:
-        st.markdown("- Entry Level Marketing Assistant")
-        st.markdown("- Dog Sitter")
\ No newline at end of file
+    for col, pair in zip(st.columns(3), (EXAMPLE_TITLES[0:2], EXAMPLE_TITLES[2:4], EXAMPLE_TITLES[4:6])):
+        with col:
+            for title in pair:
+                st.markdown(f"- {title}")
+
+
+@st.cache_resource
+def warm_up():
+    """Load the inference client and embedding model once per process, off the request path."""
+    # the ranker and the semantic cache only need the model; the app never uses the caption store
+    return tools.warm_up(), retriever.warm_up(store=False)
+
+
+@st.cache_resource
+def start_metrics(port: int):
+    """Serve the span histograms in Prometheus format, once per process."""
+    return telemetry.serve_metrics(port)
+
+
+# runs after the page is drawn so the first paint never waits on model loading
+if os.getenv("WARM_UP", "1") != "0":
+    warm_up()
+
+if os.getenv("METRICS_PORT"):
+    start_metrics(int(os.getenv("METRICS_PORT")))
+
+
+@st.cache_resource
+def start_prefetch():
+    """Keep the most requested titles warm in the background, once per process."""
+    return prefetch.prefetcher.start()
+
+
+# off by default since it spends upstream quota on its own; in worker mode results are
+# produced (and stored) by the worker processes, so warming this process's store is useless
+if os.getenv("PREFETCH", "0") != "0" and not WORKER_MODE:
+    start_prefetch()
@@ -0,0 +1,187 @@
+"""
+Every job listing we've fetched, kept in SQLite with a full-text index.
+
+Listings are de-duplicated by apply link (or title + company when there is
+none), indexed with FTS5 over title, company, location and description, and
+dropped once their `date_posted` is older than `max_age_days`. A repeat
+search can then be answered from disk in a few milliseconds, even with
+hundreds of thousands of listings stored.
+"""
+from __future__ import annotations
+import json, pathlib, re, sqlite3, threading, time
+from datetime import datetime, timedelta, timezone
+
+ARCHIVE_DB = pathlib.Path(".listings_jobassistant.sqlite")
+
+FIELDS = ("title", "company", "location", "description", "url", "date_posted", "salary")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS listings (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    title TEXT NOT NULL, company TEXT NOT NULL, location TEXT NOT NULL, description TEXT NOT NULL,
+    url TEXT NOT NULL, date_posted TEXT NOT NULL, salary TEXT NOT NULL,
+    fetched_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS listings_date_posted ON listings (date_posted);
+CREATE INDEX IF NOT EXISTS listings_fetched_at ON listings (fetched_at);
+
+-- external content table: the text lives once, in listings
+CREATE VIRTUAL TABLE IF NOT EXISTS listings_fts USING fts5(
+    title, company, location, description,
+    content='listings', content_rowid='id', tokenize='porter unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS listings_ai AFTER INSERT ON listings BEGIN
+    INSERT INTO listings_fts (rowid, title, company, location, description)
+    VALUES (new.id, new.title, new.company, new.location, new.description);
+END;
+CREATE TRIGGER IF NOT EXISTS listings_ad AFTER DELETE ON listings BEGIN
+    INSERT INTO listings_fts (listings_fts, rowid, title, company, location, description)
+    VALUES ('delete', old.id, old.title, old.company, old.location, old.description);
+END;
+CREATE TRIGGER IF NOT EXISTS listings_au AFTER UPDATE ON listings BEGIN
+    INSERT INTO listings_fts (listings_fts, rowid, title, company, location, description)
+    VALUES ('delete', old.id, old.title, old.company, old.location, old.description);
+    INSERT INTO listings_fts (rowid, title, company, location, description)
+    VALUES (new.id, new.title, new.company, new.location, new.description);
+END;
+"""
+
+
+def listing_key(job: dict) -> str:
+    """Apply link, or title + company for listings without one."""
+    if job.get("url"):
+        return job["url"]
+    return json.dumps([job.get("title", "").strip().lower(), job.get("company", "").strip().lower()])
+
+
+def match_query(query: str, location: str = "", columns: str | None = None) -> str | None:
+    """FTS5 query: every query word (in `columns` if given), every location word in the location column."""
+    words = [f'"{w}"' for w in re.findall(r"\w+", query.lower())]
+    terms = []
+    if words:
+        terms.append(f"{{{columns}}} : ({' AND '.join(words)})" if columns else " AND ".join(words))
+    terms += [f'location : "{w}"' for w in re.findall(r"\w+", location.lower())]
+    return " AND ".join(terms) or None
+
+
+class ListingArchive:
+    """SQLite + FTS5 store of normalised job listings."""
+
+    def __init__(self, path=ARCHIVE_DB, max_age_days: float | None = 30):
+        self.path = str(path)
+        self.max_age_days = max_age_days
+        self.stats = {"searches": 0, "hits": 0, "added": 0, "expired": 0}
+        self._lock = threading.Lock()
+        self._db = None
+        self._expired_at = 0.0
+
+    def _conn(self):
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.executescript(SCHEMA)
+            self._db.commit()
+        return self._db
+
+    def _cutoff(self) -> str | None:
+        if not self.max_age_days:
+            return None
+        return (datetime.now(timezone.utc) - timedelta(days=self.max_age_days)).strftime("%Y-%m-%d")
+
+    def add(self, jobs: list[dict]) -> int:
+        """Insert or replace listings (matched by listing_key); returns how many were written.
+
+        A listing fetched again is deleted and inserted afresh rather than updated
+        in place, so rowid order stays the order listings were last fetched in.
+        """
+        now = time.time()
+        rows = [
+            (listing_key(job), *[str(job.get(f) or "") for f in FIELDS], now)
+            for job in jobs if job.get("url") or job.get("company")  # skip the "no jobs found" placeholder
+        ]
+        if not rows:
+            return 0
+        with self._lock:
+            db = self._conn()
+            db.executemany("DELETE FROM listings WHERE key = ?", [(row[0],) for row in rows])
+            db.executemany(
+                f"INSERT INTO listings (key, {', '.join(FIELDS)}, fetched_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                f"ON CONFLICT(key) DO UPDATE SET {', '.join(f'{f} = excluded.{f}' for f in FIELDS)}, "
+                "fetched_at = excluded.fetched_at",
+                rows,
+            )
+            db.commit()
+            self.stats["added"] += len(rows)
+            # expiring is a cheap indexed delete, but there's no need to do it on every insert
+            if now - self._expired_at > 3600:
+                self._expire(db)
+        return len(rows)
+
+    def expire(self) -> int:
+        """Delete listings posted more than max_age_days ago; returns how many went."""
+        with self._lock:
+            return self._expire(self._conn())
+
+    def _expire(self, db) -> int:
+        self._expired_at = time.time()
+        cutoff = self._cutoff()
+        if cutoff is None:
+            return 0
+        # listings without a posting date age by when we fetched them
+        cur = db.execute(
+            "DELETE FROM listings WHERE (date_posted != '' AND date_posted < ?) OR (date_posted = '' AND fetched_at < ?)",
+            (cutoff, time.time() - self.max_age_days * 86400),
+        )
+        db.commit()
+        self.stats["expired"] += cur.rowcount
+        return cur.rowcount
+
+    def search(self, query: str, location: str = "", limit: int = 10,
+               max_fetched_age: float | None = None) -> list[dict]:
+        """Most recently fetched unexpired listings matching the search.
+
+        Listings with every query word in the title or company come first; only
+        if there aren't `limit` of those are description matches added. Results
+        are most recently fetched first rather than scored (bm25 has to score every match, far
+        too slow for common words), the ranker orders them by relevance later.
+        """
+        found, seen = [], set()
+        for columns in ("title company", None):
+            if len(found) >= limit:
+                break
+            for row in self._match(match_query(query, location, columns), limit, max_fetched_age):
+                if row[0] not in seen:
+                    seen.add(row[0])
+                    found.append(dict(zip(FIELDS, row[1:])))
+        with self._lock:
+            self.stats["searches"] += 1
+            self.stats["hits"] += bool(found)
+        return found[:limit]
+
+    def _match(self, match, limit, max_fetched_age):
+        if match is None:
+            return []
+        # ORDER BY rowid DESC walks the index most recently fetched first (add() re-inserts
+        # listings it sees again) and stops at the limit, no sort over every match
+        sql = (
+            f"SELECT l.id, {', '.join('l.' + f for f in FIELDS)} FROM listings_fts "
+            "JOIN listings l ON l.id = listings_fts.rowid WHERE listings_fts MATCH ?"
+        )
+        params: list = [match]
+        cutoff = self._cutoff()
+        if cutoff is not None:
+            sql += " AND (l.date_posted = '' OR l.date_posted >= ?)"
+            params.append(cutoff)
+        if max_fetched_age is not None:
+            sql += " AND l.fetched_at >= ?"
+            params.append(time.time() - max_fetched_age)
+        sql += " ORDER BY listings_fts.rowid DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            return self._conn().execute(sql, params).fetchall()
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn().execute("SELECT COUNT(*) FROM listings").fetchone()[0]
@@ -0,0 +1,122 @@
+"""
+Run the agent over many job titles without the UI.
+
+    python batch.py titles.txt -o results.jsonl --workers 8 --llm-concurrency 4
+    cat titles.txt | python batch.py -o results.jsonl
+
+Every finished title is appended to the output as one JSON line
+({"title", "result", "elapsed_s", "finished_at"} or {"title", "error"}), so an
+interrupted batch loses at most the titles that were in flight. Running the
+same command again skips every title that already has a successful line.
+"""
+from __future__ import annotations
+import argparse, json, sys, time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import agent, resilience
+from listing import json_default
+from results import failed, normalize_title
+
+
+def read_titles(path: str) -> list[str]:
+    """Job titles from a file ("-" = stdin), one per line, duplicates and blanks dropped."""
+    f = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    try:
+        titles, seen = [], set()
+        for line in f:
+            title = line.strip()
+            if title and not title.startswith("#") and normalize_title(title) not in seen:
+                seen.add(normalize_title(title))
+                titles.append(title)
+        return titles
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def finished_titles(path: str) -> set[str]:
+    """Normalised titles that already have a successful line in the output file."""
+    done = set()
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # the last line of a killed run can be cut off
+                if "result" in row and "error" not in row:
+                    done.add(normalize_title(row["title"]))
+    except FileNotFoundError:
+        pass
+    return done
+
+
+def run_one(title: str, max_workers: int) -> dict:
+    started = time.perf_counter()
+    try:
+        result = agent.run_agent(title, log=None, max_workers=max_workers)
+    except Exception as e:
+        return {"title": title, "error": f"{type(e).__name__}: {e}"}
+    row = {"title": title, "result": result, "elapsed_s": round(time.perf_counter() - started, 2),
+           "finished_at": time.strftime("%Y-%m-%dT%H:%M:%S")}
+    if failed(result):
+        # keep what was generated, but mark it so the next run tries again
+        row["error"] = "generation failed"
+    return row
+
+
+def run_batch(titles: list[str], output: str, workers: int = 4, agent_workers: int = 4,
+              progress=None) -> dict:
+    """Run every title not already finished in `output`, appending one JSON line per title."""
+    done = finished_titles(output)
+    todo = [t for t in titles if normalize_title(t) not in done]
+    counts = {"total": len(titles), "skipped": len(titles) - len(todo), "ok": 0, "failed": 0}
+
+    with open(output, "a", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(run_one, title, agent_workers): title for title in todo}
+        try:
+            for n, fut in enumerate(as_completed(futures), 1):
+                row = fut.result()
+                out.write(json.dumps(row, ensure_ascii=False, default=json_default) + "\n")
+                out.flush()
+                counts["failed" if "error" in row else "ok"] += 1
+                if progress is not None:
+                    status = row.get("error") or f"{row['elapsed_s']}s"
+                    progress(f"[{n}/{len(todo)}] {row['title']} ({status})")
+        except KeyboardInterrupt:
+            # titles that haven't started are dropped; the rerun picks them up
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate job search materials for many job titles.")
+    parser.add_argument("titles", nargs="?", default="-", help="file with one job title per line (default: stdin)")
+    parser.add_argument("-o", "--output", required=True, help="JSON lines file to append results to")
+    parser.add_argument("--workers", type=int, default=4, help="agents running at the same time")
+    parser.add_argument("--agent-workers", type=int, default=4, help="tools running at the same time per agent")
+    parser.add_argument("--llm-concurrency", type=int, help="HF requests in flight at once")
+    parser.add_argument("--jobs-concurrency", type=int, help="JSearch requests in flight at once")
+    parser.add_argument("--posts-concurrency", type=int, help="SerpAPI requests in flight at once")
+    args = parser.parse_args(argv)
+
+    for name, limit in (("hf", args.llm_concurrency), ("jsearch", args.jobs_concurrency),
+                        ("serpapi", args.posts_concurrency)):
+        if limit is not None:
+            resilience.configure(name, concurrency=limit)
+
+    titles = read_titles(args.titles)
+    started = time.perf_counter()
+    try:
+        counts = run_batch(titles, args.output, args.workers, args.agent_workers,
+                           progress=lambda line: print(line, file=sys.stderr))
+    except KeyboardInterrupt:
+        print("Interrupted, run the same command again to continue.", file=sys.stderr)
+        return 130
+    print(f"{counts['ok']} done, {counts['failed']} failed, {counts['skipped']} already done "
+          f"of {counts['total']} titles in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    return 1 if counts["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,331 @@
+"""
+Offline benchmark for run_agent.
+
+Starts local stand-ins for the JSearch (RapidAPI), SerpAPI and Hugging Face
+chat-completion endpoints with configurable latency, jitter, error rate and
+payload sizes, points `tools` at them and runs many agents concurrently.
+Reports per-stage and end-to-end p50/p95/p99 latency, throughput and memory.
+
+    python bench.py --runs 50 --concurrency 8
+    python bench.py --llm-latency 0.8 --token-ms 5 --stream --json
+"""
+from __future__ import annotations
+import argparse, json, random, resource, threading, time, tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+import numpy as np
+
+import agent, resilience, results, telemetry, tools
+from archive import ListingArchive
+from cache import Cache
+from semcache import SemanticCache
+
+WORDS = ("experienced collaborative engineer delivered scalable reliable systems improving "
+         "customer outcomes across teams with measurable impact").split()
+
+
+def _words(n: int, rng: random.Random) -> list[str]:
+    return [rng.choice(WORDS) for _ in range(n)]
+
+
+class FakeUpstreams:
+    """One local HTTP server answering like JSearch, SerpAPI and HF chat completions."""
+
+    def __init__(self, llm_latency=0.5, jobs_latency=0.3, posts_latency=0.3, jitter=0.1,
+                 error_rate=0.0, tokens=300, token_ms=0.0, listings=10, description_words=300,
+                 seed=0):
+        self.cfg = dict(llm_latency=llm_latency, jobs_latency=jobs_latency, posts_latency=posts_latency,
+                        jitter=jitter, error_rate=error_rate, tokens=tokens, token_ms=token_ms,
+                        listings=listings, description_words=description_words)
+        self.rng = random.Random(seed)
+        self.rng_lock = threading.Lock()
+        self.requests = {"jobs": 0, "posts": 0, "llm": 0, "errors": 0}
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _delay(self, base: float):
+        with self.rng_lock:
+            jitter = self.rng.uniform(-self.cfg["jitter"], self.cfg["jitter"])
+        time.sleep(max(base + jitter, 0))
+
+    def _fails(self) -> bool:
+        with self.rng_lock:
+            return self.rng.random() < self.cfg["error_rate"]
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like the real APIs
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body: bytes, content_type="application/json"):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _error(self, kind):
+                fake.requests["errors"] += 1
+                self._send(503, json.dumps({"error": f"injected {kind} failure"}).encode())
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                params = {k: v[0] for k, v in parse_qs(url.query).items()}
+                if url.path == "/jsearch":
+                    fake.requests["jobs"] += 1
+                    fake._delay(fake.cfg["jobs_latency"])
+                    if fake._fails():
+                        return self._error("jobs")
+                    return self._send(200, json.dumps(fake.jobs_payload(params)).encode())
+                if url.path == "/serpapi":
+                    fake.requests["posts"] += 1
+                    fake._delay(fake.cfg["posts_latency"])
+                    if fake._fails():
+                        return self._error("posts")
+                    return self._send(200, json.dumps(fake.posts_payload(params)).encode())
+                self._send(404, b'{"message": "Not found"}')
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if not self.path.endswith("/chat/completions"):
+                    return self._send(404, b'{"message": "Not found"}')
+                fake.requests["llm"] += 1
+                fake._delay(fake.cfg["llm_latency"])
+                if fake._fails():
+                    return self._error("llm")
+                text = fake.completion_text(body)
+                if not body.get("stream"):
+                    return self._send(200, json.dumps(fake.completion_payload(body, text)).encode())
+
+                # server-sent events, one word per chunk
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                for word in text.split(" "):
+                    if fake.cfg["token_ms"]:
+                        time.sleep(fake.cfg["token_ms"] / 1000)
+                    chunk = fake.chunk_payload(body, word + " ")
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                    self.wfile.flush()
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.close_connection = True
+
+        return Handler
+
+    def jobs_payload(self, params):
+        page = int(params.get("page", 1))
+        with self.rng_lock:
+            data = [{
+                "job_title": f"{params.get('query', 'Job')} #{page}-{i}",
+                "employer_name": f"Company {i}",
+                "job_location": "Springfield",
+                "job_description": " ".join(_words(self.cfg["description_words"], self.rng)),
+                "job_apply_link": f"https://jobs.example/{page}/{i}",
+                "job_posted_at_datetime_utc": time.strftime("%Y-%m-%dT00:00:00Z", time.gmtime()),
+                "job_salary": "",
+            } for i in range(self.cfg["listings"])]
+        return {"status": "OK", "data": data}
+
+    def posts_payload(self, params):
+        q = params.get("q", "")
+        return {"organic_results": [
+            {"title": f"{q[:40]} article {i}", "link": f"https://news.example/{i}", "snippet": "..."}
+            for i in range(5)
+        ]}
+
+    def completion_text(self, body) -> str:
+        prompt = body["messages"][-1]["content"]
+        if "comma-separated" in prompt:
+            return "Python, SQL, Communication, Git, Testing, Cloud, Docker, Linux"
+        with self.rng_lock:
+            return " ".join(_words(self.cfg["tokens"], self.rng))
+
+    def completion_payload(self, body, text):
+        return {
+            "id": "bench", "object": "chat.completion", "created": int(time.time()),
+            "model": body.get("model", "bench"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": text}}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": len(text.split()), "total_tokens": 0},
+        }
+
+    def chunk_payload(self, body, word):
+        return {
+            "id": "bench", "object": "chat.completion.chunk", "created": int(time.time()),
+            "model": body.get("model", "bench"),
+            "choices": [{"index": 0, "finish_reason": None, "delta": {"role": "assistant", "content": word}}],
+        }
+
+
+def point_tools_at(base_url: str, caches: bool = False, embeddings: bool = False):
+    """Aim tools at the fake upstreams (and keep the real caches out of the numbers)."""
+    from huggingface_hub import InferenceClient
+
+    tools.JSEARCH_URL = f"{base_url}/jsearch"
+    tools.SERPAPI_URL = f"{base_url}/serpapi"
+    tools._client = InferenceClient(base_url=base_url, token="bench")
+    tools.get_secret.cache_clear()
+    # never the real cache file: fake completions and listings must not reach the app
+    if not caches:
+        tools.llm_cache = Cache("llm_responses", path=None, maxsize=0)
+        tools.jobs_cache = Cache("job_searches", path=None, maxsize=0)
+        results.store = results.ResultStore(max_bytes=0)
+        tools.JOBS_ARCHIVE = False
+    else:
+        tools.llm_cache = Cache("llm_responses", path=None, maxsize=10000)
+        tools.jobs_cache = Cache("job_searches", path=None, maxsize=10000)
+        results.store = results.ResultStore()
+        tools.listing_archive = ListingArchive(":memory:")
+    tools.semantic_cache = SemanticCache(path=":memory:", threshold=tools.semantic_cache.threshold)
+    if not embeddings:
+        # ranking and the semantic cache need the sentence model, which isn't offline
+        tools.SEMANTIC_CACHE = False
+        tools.ranker.rank_jobs = lambda jobs, goal, skills=None, **kw: jobs
+
+
+def percentiles(samples) -> dict:
+    if not samples:
+        return {"n": 0}
+    arr = np.asarray(samples) * 1000
+    p50, p95, p99 = np.percentile(arr, [50, 95, 99])
+    return {"n": len(arr), "p50_ms": round(p50, 1), "p95_ms": round(p95, 1),
+            "p99_ms": round(p99, 1), "max_ms": round(arr.max(), 1)}
+
+
+def run_benchmark(titles, concurrency: int, stream: bool = False) -> dict:
+    """Run one agent per title, `concurrency` at a time, and collect the telemetry spans."""
+    spans = []
+    first_token: dict[str, list[float]] = {}
+    lock = threading.Lock()
+
+    def collect(span):
+        with lock:
+            spans.append(span)
+
+    def one(title):
+        marks = {}
+
+        def on_token(tool, chunk):
+            if tool not in marks:
+                marks[tool] = time.perf_counter() - start
+        start = time.perf_counter()
+        agent.run_agent(title, log=None, stream=on_token if stream else None)
+        with lock:
+            for tool, t in marks.items():
+                first_token.setdefault(tool, []).append(t)
+
+    telemetry.metrics.reset()
+    telemetry.add_exporter(collect)
+    tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(one, titles))
+    finally:
+        telemetry.remove_exporter(collect)
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    stages: dict[str, list[float]] = {}
+    for span in spans:
+        if span["name"] == "tool":
+            stages.setdefault(span["tool"], []).append(span["duration_ms"] / 1000)
+    totals = [span["duration_ms"] / 1000 for span in spans if span["name"] == "agent"]
+
+    return {
+        "runs": len(titles),
+        "concurrency": concurrency,
+        "wall_s": round(elapsed, 3),
+        "throughput_runs_per_s": round(len(titles) / elapsed, 2),
+        "end_to_end": percentiles(totals),
+        "stages": {name: percentiles(samples) for name, samples in sorted(stages.items())},
+        # first token is measured from the start of the run, not of the stage
+        "first_token": {name: percentiles(samples) for name, samples in sorted(first_token.items())},
+        "counters": telemetry.metrics.snapshot(),
+        "memory": {"traced_peak_mb": round(peak / 2**20, 1),
+                   "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)},
+    }
+
+
+def print_report(report: dict, upstream_requests: dict):
+    print(f"{report['runs']} runs, concurrency {report['concurrency']}: "
+          f"{report['wall_s']} s, {report['throughput_runs_per_s']} runs/s")
+    rows = [("end-to-end", report["end_to_end"])] + list(report["stages"].items())
+    rows += [(f"{name} first token", p) for name, p in report["first_token"].items()]
+    print(f"{'stage':<22}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, p in rows:
+        if p["n"]:
+            print(f"{name:<22}{p['n']:>6}{p['p50_ms']:>10}{p['p95_ms']:>10}{p['p99_ms']:>10}")
+    print(f"memory: traced peak {report['memory']['traced_peak_mb']} MB, "
+          f"max RSS {report['memory']['max_rss_mb']} MB")
+    print(f"upstream requests: {upstream_requests}")
+    for name, s in report.get("resilience", {}).items():
+        print(f"{name}: {s['state']}, {s['retries']} retries, {s['hedges']} hedges "
+              f"({s['hedge_wins']} won), {s['rejected']} rejected, {s['throttled']} throttled")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark run_agent against local fake upstreams.")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4, help="agents running at the same time")
+    parser.add_argument("--titles", help="file with one job title per line (default: unique synthetic titles)")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="seconds before the first token")
+    parser.add_argument("--jobs-latency", type=float, default=0.3)
+    parser.add_argument("--posts-latency", type=float, default=0.3)
+    parser.add_argument("--jitter", type=float, default=0.1, help="+/- seconds added to every latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--tokens", type=int, default=300, help="words per generated resume/cover letter")
+    parser.add_argument("--token-ms", type=float, default=0.0, help="delay between streamed tokens")
+    parser.add_argument("--listings", type=int, default=10, help="listings per JSearch page")
+    parser.add_argument("--description-words", type=int, default=300)
+    parser.add_argument("--stream", action="store_true", help="stream resume/cover tokens")
+    parser.add_argument("--caches", action="store_true", help="keep the LLM/job caches on (in memory)")
+    parser.add_argument("--embeddings", action="store_true", help="include ranking and the semantic cache")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    if args.titles:
+        with open(args.titles, encoding="utf-8") as f:
+            titles = [line.strip() for line in f if line.strip()]
+        titles = (titles * (args.runs // len(titles) + 1))[:args.runs]
+    else:
+        titles = [f"Benchmark Engineer {i}" for i in range(args.runs)]
+
+    with FakeUpstreams(args.llm_latency, args.jobs_latency, args.posts_latency, args.jitter,
+                       args.error_rate, args.tokens, args.token_ms, args.listings,
+                       args.description_words, args.seed) as fake:
+        point_tools_at(fake.url, caches=args.caches, embeddings=args.embeddings)
+        report = run_benchmark(titles, args.concurrency, stream=args.stream)
+        report["upstream_requests"] = dict(fake.requests)
+        report["resilience"] = resilience.stats()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report, report["upstream_requests"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Two-tier response cache: an in-memory LRU in front of a SQLite table.
+"""
+from __future__ import annotations
+import hashlib, json, pathlib, sqlite3, threading, time
+from collections import OrderedDict
+
+CACHE_DB = pathlib.Path(".cache_jobassistant.sqlite")
+
+
+def make_key(*parts) -> str:
+    """Stable hash of any JSON-serialisable parts."""
+    raw = json.dumps(parts, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class Cache:
+    """LRU + SQLite cache with TTL and size-based eviction.
+
+    Values must be JSON-serialisable. Both tiers drop entries older than
+    `ttl` seconds; the memory tier keeps at most `maxsize` entries and the
+    disk tier at most `max_rows` (oldest go first).
+    """
+
+    def __init__(self, table: str, path=CACHE_DB, maxsize: int = 256,
+                 ttl: float = 7 * 24 * 3600, max_rows: int = 5000):
+        if not table.isidentifier():
+            raise ValueError(f"Invalid cache table name: {table}")
+        self.table = table
+        self.path = pathlib.Path(path) if path else None
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self.stats = {"hits": 0, "misses": 0, "memory_hits": 0, "disk_hits": 0,
+                      "sets": 0, "evictions": 0}
+        self._mem: OrderedDict[str, tuple[float, object]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+
+    def _conn(self):
+        # opened on first use so importing the module never touches the disk
+        if self._db is None and self.path is not None:
+            self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._db.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL)"
+            )
+            self._db.execute(
+                f"CREATE INDEX IF NOT EXISTS {self.table}_stored_at ON {self.table}(stored_at)"
+            )
+            self._db.commit()
+        return self._db
+
+    def _remember(self, key, stored_at, value):
+        self._mem[key] = (stored_at, value)
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.maxsize:
+            self._mem.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def get_entry(self, key: str, max_age: float | None = None):
+        """Return (value, age in seconds) or None if missing or older than max_age (default ttl)."""
+        max_age = self.ttl if max_age is None else max_age
+        now = time.time()
+        with self._lock:
+            entry = self._mem.get(key)
+            if entry and now - entry[0] <= max_age:
+                self._mem.move_to_end(key)
+                self.stats["hits"] += 1
+                self.stats["memory_hits"] += 1
+                return entry[1], now - entry[0]
+
+            db = self._conn()
+            row = None
+            if db is not None:
+                row = db.execute(
+                    f"SELECT value, stored_at FROM {self.table} WHERE key = ?", (key,)
+                ).fetchone()
+            if row and now - row[1] <= max_age:
+                value = json.loads(row[0])
+                self._remember(key, row[1], value)
+                self.stats["hits"] += 1
+                self.stats["disk_hits"] += 1
+                return value, now - row[1]
+
+            self.stats["misses"] += 1
+            return None
+
+    def get(self, key: str, default=None):
+        """Return the cached value or `default` on a miss."""
+        entry = self.get_entry(key)
+        return entry[0] if entry else default
+
+    def set(self, key: str, value):
+        """Store a value in both tiers."""
+        now = time.time()
+        raw = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._remember(key, now, value)
+            self.stats["sets"] += 1
+            db = self._conn()
+            if db is None:
+                return
+            db.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, stored_at) VALUES (?, ?, ?)",
+                (key, raw, now),
+            )
+            # expire old rows, then trim the table to max_rows
+            cur = db.execute(f"DELETE FROM {self.table} WHERE stored_at < ?", (now - self.ttl,))
+            evicted = cur.rowcount
+            cur = db.execute(
+                f"DELETE FROM {self.table} WHERE key IN "
+                f"(SELECT key FROM {self.table} ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_rows,),
+            )
+            evicted += cur.rowcount
+            self.stats["evictions"] += max(evicted, 0)
+            db.commit()
+
+    def delete(self, key: str):
+        with self._lock:
+            self._mem.pop(key, None)
+            db = self._conn()
+            if db is not None:
+                db.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._mem.clear()
+            db = self._conn()
+            if db is not None:
+                db.execute(f"DELETE FROM {self.table}")
+                db.commit()
+
+    def hit_rate(self) -> float:
+        total = self.stats["hits"] + self.stats["misses"]
+        return round(self.stats["hits"] / total, 3) if total else 0.0
@@ -0,0 +1,64 @@
+"""
+Import-time report: how long each of our modules takes to import.
+
+Every module is imported in a fresh interpreter with `python -X importtime`
+so the numbers are cold-start costs, not cached ones.
+
+    python importcost.py                 # all modules
+    python importcost.py tools retriever --top 15
+"""
+import argparse, subprocess, sys
+
+MODULES = ["cache", "aio", "planner", "tools", "agent", "retriever"]
+
+
+def import_times(module: str):
+    """Return [(cumulative_us, self_us, name)] for `module` and everything it pulls in."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr.strip().splitlines()[-1]}")
+
+    rows = []
+    for line in proc.stderr.splitlines():
+        # import time:   self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative), int(self_us), name.rstrip()))
+
+    # children are printed (more indented) right before their parent, so the
+    # module's subtree is the run of deeper lines just above its own line
+    depth = lambda name: len(name) - len(name.lstrip())
+    end = max(i for i, row in enumerate(rows) if row[2].strip() == module)
+    start = end
+    while start > 0 and depth(rows[start - 1][2]) > depth(rows[end][2]):
+        start -= 1
+    return rows[start:end + 1]
+
+
+def report(modules, top: int = 10):
+    for module in modules:
+        try:
+            rows = import_times(module)
+        except RuntimeError as e:
+            print(f"{module}: {e}\n")
+            continue
+        print(f"{module}: {rows[-1][0] / 1000:.1f} ms")
+        for cum, _, name in sorted(rows, reverse=True)[1:top + 1]:
+            print(f"  {cum / 1000:8.1f} ms  {name.strip()}")
+        print()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report import cost per module.")
+    parser.add_argument("modules", nargs="*", default=MODULES)
+    parser.add_argument("--top", type=int, default=10, help="heaviest imports to list per module")
+    args = parser.parse_args(argv)
+    report(args.modules, args.top)
+
+
+if __name__ == "__main__":
+    main()
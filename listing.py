@@ -0,0 +1,179 @@
+"""
+Compact job listing record.
+
+JSearch descriptions are often many KB and every session keeps its results
+in memory, while the page only ever shows a 300 character excerpt. A
+JobListing cleans its fields once when the listing comes in, keeps the
+excerpt as text and the full description zlib-compressed, decompressing it
+only when something actually asks for it.
+
+Listings still behave like the old dicts for reading (`job["title"]`,
+`job.get("url")`), and to_dict()/from_dict() convert to and from the plain
+form used in caches, the archive and batch output.
+"""
+from __future__ import annotations
+import base64, re, zlib
+
+EXCERPT_CHARS = 300
+
+
+def clean_text(text):
+    if not isinstance(text, str):
+        return text
+    text = text.replace('\n', ' ').replace('\r', ' ') # replaces \n and \r with space
+    text = re.sub(r'\s+', ' ', text) # replaces multiple spaces with a single space
+    return text.strip()
+
+
+class JobListing:
+    """One job listing with cleaned fields and a lazily decompressed description."""
+
+    __slots__ = ("title", "company", "location", "url", "date_posted", "salary",
+                 "excerpt", "relevance", "_description")
+
+    FIELDS = ("title", "company", "location", "description", "url", "date_posted", "salary")
+
+    def __init__(self, title="", company="", location="", description="", url="",
+                 date_posted="", salary="", relevance=None, excerpt=None, _compressed=None):
+        self.title = clean_text(title or "")
+        self.company = clean_text(company or "")
+        self.location = clean_text(location or "")
+        self.url = url or ""
+        self.date_posted = date_posted or ""
+        self.salary = clean_text(salary or "")
+        self.relevance = relevance
+        if _compressed is None:
+            description = description or ""
+            _compressed = zlib.compress(description.encode("utf-8"))
+            if excerpt is None:
+                excerpt = clean_text(description[:EXCERPT_CHARS] + "...")
+        self._description = _compressed
+        self.excerpt = excerpt or ""
+
+    @classmethod
+    def from_raw(cls, item: dict) -> "JobListing":
+        """Build from a raw JSearch result item."""
+        return cls(
+            title=item.get("job_title", "Unknown Position"),
+            company=item.get("employer_name", "Unknown Company"),
+            location=item.get("job_location", "Location not specified"),
+            description=item.get("job_description", "No description available"),
+            url=item.get("job_apply_link", ""),
+            date_posted=item.get("job_posted_at_datetime_utc", "")[:10] if item.get("job_posted_at_datetime_utc") else "",
+            salary=item.get("job_salary", ""),
+        )
+
+    @classmethod
+    def from_dict(cls, data) -> "JobListing":
+        """Build from a listing dict (plain, to_dict() or to_compact() form); JobListings pass through."""
+        if isinstance(data, JobListing):
+            return data
+        compressed = base64.b64decode(data["description_z"]) if data.get("description_z") else None
+        return cls(
+            title=data.get("title", ""), company=data.get("company", ""), location=data.get("location", ""),
+            description=data.get("description", ""), url=data.get("url", ""),
+            date_posted=data.get("date_posted", ""), salary=data.get("salary", ""),
+            relevance=data.get("relevance"), excerpt=data.get("excerpt"), _compressed=compressed,
+        )
+
+    @property
+    def description(self) -> str:
+        """Full description, decompressed on every access (it isn't kept around as text)."""
+        return zlib.decompress(self._description).decode("utf-8")
+
+    def description_head(self, chars: int) -> str:
+        """The first `chars` characters of the description without decompressing the rest."""
+        # utf-8 is at most 4 bytes a character
+        head = zlib.decompressobj().decompress(self._description, chars * 4)
+        return head.decode("utf-8", errors="ignore")[:chars]
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the text fields."""
+        return len(self._description) + sum(
+            len(getattr(self, f)) for f in ("title", "company", "location", "url", "date_posted", "salary", "excerpt")
+        )
+
+    def with_relevance(self, score: float) -> "JobListing":
+        """Copy with a relevance score (the compressed description is shared, not copied)."""
+        copy = JobListing.__new__(JobListing)
+        for name in self.__slots__:
+            setattr(copy, name, getattr(self, name))
+        copy.relevance = score
+        return copy
+
+    def to_dict(self) -> dict:
+        """Plain dict with the full description, the shape listings had before this class."""
+        data = {f: getattr(self, f) for f in self.FIELDS}
+        data["excerpt"] = self.excerpt
+        if self.relevance is not None:
+            data["relevance"] = self.relevance
+        return data
+
+    def to_compact(self) -> dict:
+        """JSON-safe dict that keeps the description compressed (for caches)."""
+        data = {f: getattr(self, f) for f in self.FIELDS if f != "description"}
+        data["excerpt"] = self.excerpt
+        data["description_z"] = base64.b64encode(self._description).decode("ascii")
+        if self.relevance is not None:
+            data["relevance"] = self.relevance
+        return data
+
+    def summary(self) -> str:
+        """One short line for logs."""
+        where = f" ({self.location})" if self.location else ""
+        return f"{self.title} at {self.company}{where}" if self.company else f"{self.title}{where}"
+
+    # read-only dict compatibility, for code that still treats listings as dicts
+
+    def __getitem__(self, key):
+        if key in self.FIELDS or key in ("excerpt", "relevance"):
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            value = self[key]
+        except KeyError:
+            return default
+        return default if value is None else value
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def keys(self):
+        return list(self.FIELDS) + ["excerpt"] + (["relevance"] if self.relevance is not None else [])
+
+    def __repr__(self):
+        return f"JobListing({self.summary()!r})"
+
+
+def json_default(obj):
+    """json.dumps default= that writes JobListings out as plain dicts."""
+    if isinstance(obj, JobListing):
+        return obj.to_dict()
+    return str(obj)
+
+
+def summarize(value, limit: int = 600) -> str:
+    """Short text for an agent output without stringifying large payloads."""
+    if isinstance(value, str):
+        return value[:limit]
+    if isinstance(value, list):
+        parts, used = [], 0
+        for item in value:
+            if isinstance(item, JobListing):
+                text = item.summary()
+            elif isinstance(item, dict):
+                text = item.get("title") or str(item)[:100]
+            else:
+                text = str(item)[:100]
+            if used + len(text) > limit:
+                parts.append(f"... {len(value) - len(parts)} more")
+                break
+            parts.append(text)
+            used += len(text) + 2
+        return f"[{len(value)}] " + "; ".join(parts)
+    if isinstance(value, dict):
+        return "{" + ", ".join(f"{k}: {summarize(v, 80)}" for k, v in value.items() if v)[:limit] + "}"
+    return str(value)[:limit]
@@ -1,11 +1,35 @@
 """
 Turns a job title → task list for the agent.
+
+Each task declares the memory keys it reads (`inputs`) and writes (`outputs`)
+so the agent can run independent tools side by side.
 """
-def generate_tasks(goal: str):
-    return [
-        {"thought": "Research skills required", "tool": "skills"},
-        {"thought": "Draft tailored resume",     "tool": "resume"},
-        {"thought": "Draft tailored cover letter","tool": "cover"},
-        {"thought": "Find matching job listings", "tool": "jobs"},
-        {"thought": "Find related posts for this job", "tool": "posts"}
+import os
+
+# LLM_BUNDLE=1 gets skills, resume and cover letter from one structured LLM call
+BUNDLE = os.getenv("LLM_BUNDLE", "0") != "0"
+
+
+def generate_tasks(goal: str, bundle: bool = None):
+    if bundle is None:
+        bundle = BUNDLE
+    if bundle:
+        writing = [
+            {"thought": "Research skills and draft resume and cover letter", "tool": "bundle",
+             "inputs": [], "outputs": ["skills", "resume", "cover", "resume_sections", "cover_sections"]},
+        ]
+    else:
+        writing = [
+            {"thought": "Research skills required", "tool": "skills",
+             "inputs": [], "outputs": ["skills"]},
+            {"thought": "Draft tailored resume",     "tool": "resume",
+             "inputs": ["skills"], "outputs": ["resume"]},
+            {"thought": "Draft tailored cover letter","tool": "cover",
+             "inputs": ["skills"], "outputs": ["cover"]},
+        ]
+    return writing + [
+        {"thought": "Find matching job listings", "tool": "jobs",
+         "inputs": ["location"], "outputs": ["jobs"]},
+        {"thought": "Find related posts for this job", "tool": "posts",
+         "inputs": ["company", "location"], "outputs": ["posts"]}
     ]
@@ -0,0 +1,135 @@
+"""
+Keep the most requested job titles warm in the result store.
+
+The app calls `prefetcher.record(title)` for every request. A daemon thread
+periodically takes the top PREFETCH_TOP_N titles asked for at least
+PREFETCH_MIN_REQUESTS times (by decaying count) and re-runs the agent for any
+whose stored result is missing or about to expire, so popular titles are
+answered straight from `results.store`.
+
+Background runs go through the same run_agent/use_tool paths (and so the
+same caches, rate limits and breakers) as user requests. PREFETCH_BUDGET caps
+agent runs per hour, not upstream calls: every run asks SerpAPI again (posts
+aren't cached) and JSearch whenever its cache is stale, so size the budget
+against those quotas. The app only starts the prefetcher with PREFETCH=1.
+"""
+from __future__ import annotations
+import os, threading, time
+from collections import Counter, deque
+import resilience, results
+
+
+class Prefetcher:
+    """Request counts per normalised goal and the loop that refreshes the top ones."""
+
+    def __init__(self, top_n: int = 10, interval: float = 60, margin: float = 600,
+                 budget: int = 30, half_life: float = 24 * 3600, min_count: float = 2, store=None):
+        self.top_n = top_n
+        self.min_count = min_count    # requests a title needs before it's worth prefetching
+        self.interval = interval      # seconds between checks
+        self.margin = margin          # refresh this many seconds before an entry expires
+        self.budget = budget          # agent runs per hour
+        self.half_life = half_life    # counts halve this often, so popularity follows recent demand
+        self.store = store
+        self.stats = {"runs": 0, "failures": 0, "skipped_budget": 0, "skipped_breaker": 0}
+        self._counts: Counter = Counter()
+        self._titles: dict[str, str] = {}  # normalised -> title as last typed
+        self._runs: deque = deque()        # start times of runs in the last hour
+        self._lock = threading.Lock()
+        self._decayed = time.time()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def record(self, title: str, weight: float = 1.0):
+        key = results.normalize_title(title)
+        if not key:
+            return
+        with self._lock:
+            self._counts[key] += weight
+            self._titles[key] = title
+
+    def hot(self) -> list[str]:
+        """The top_n titles by request count, leaving out one-off requests."""
+        with self._lock:
+            self._decay()
+            return [self._titles[key] for key, count in self._counts.most_common(self.top_n)
+                    if count >= self.min_count]
+
+    def _decay(self):
+        periods = (time.time() - self._decayed) / self.half_life
+        if periods < 1:
+            return
+        factor = 0.5 ** int(periods)
+        for key in list(self._counts):
+            self._counts[key] *= factor
+            if self._counts[key] < 0.01:
+                del self._counts[key], self._titles[key]
+        self._decayed = time.time()
+
+    def due(self) -> list[str]:
+        """Hot titles with no stored result, or one that expires within `margin`."""
+        store = self.store or results.store
+        due = []
+        for title in self.hot():
+            age = store.age(title)
+            if age is None or (store.ttl is not None and age > store.ttl - self.margin):
+                due.append(title)
+        return due
+
+    def _take_budget(self) -> bool:
+        now = time.time()
+        with self._lock:
+            while self._runs and now - self._runs[0] > 3600:
+                self._runs.popleft()
+            if len(self._runs) >= self.budget:
+                return False
+            self._runs.append(now)
+            return True
+
+    def run_once(self) -> int:
+        """Refresh whatever is due (within budget); returns how many titles were refreshed."""
+        import agent  # the agent pulls in every tool, only load it when there's work
+
+        refreshed = 0
+        for title in self.due():
+            if any(u.state != "closed" for u in resilience.upstreams.values()):
+                # an upstream is struggling, leave its capacity to real users
+                self.stats["skipped_breaker"] += 1
+                break
+            if not self._take_budget():
+                self.stats["skipped_budget"] += 1
+                break
+            try:
+                agent.run_agent(title, log=None, cached=False)
+                self.stats["runs"] += 1
+                refreshed += 1
+            except Exception as e:
+                self.stats["failures"] += 1
+                print(f"Error prefetching '{title}': {e}")
+        return refreshed
+
+    def start(self):
+        """Run the refresh loop on a daemon thread (once)."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="prefetch", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Error in prefetch loop: {e}")
+
+
+prefetcher = Prefetcher(
+    top_n=int(os.getenv("PREFETCH_TOP_N", 10)),
+    interval=float(os.getenv("PREFETCH_INTERVAL", 60)),
+    margin=float(os.getenv("PREFETCH_MARGIN", 600)),
+    budget=int(os.getenv("PREFETCH_BUDGET", 30)),
+    min_count=float(os.getenv("PREFETCH_MIN_REQUESTS", 2)),
+)
@@ -0,0 +1,112 @@
+"""
+Relevance ranking and near-duplicate removal for job listings.
+
+Listings and the goal are embedded in one batch with the retriever model,
+scored by cosine similarity, and reposts of the same job (e.g. from
+different boards) are collapsed before the list reaches the UI.
+"""
+from __future__ import annotations
+import hashlib, os, threading
+from collections import OrderedDict
+import numpy as np
+import retriever
+from listing import JobListing
+
+# two listings this similar are treated as the same job
+DUPLICATE_THRESHOLD = float(os.getenv("JOB_DUPLICATE_THRESHOLD", 0.92))
+DESCRIPTION_CHARS = 600  # the model only reads ~256 tokens anyway
+EMBED_CACHE_SIZE = 5000
+
+_embeddings: OrderedDict[str, np.ndarray] = OrderedDict()
+_lock = threading.Lock()
+
+
+def listing_id(job: dict) -> str:
+    """Stable id for a listing: its apply link, or a hash of title/company/description."""
+    if job.get("url"):
+        key = job["url"]
+    else:
+        key = "|".join([job.get("title", ""), job.get("company", ""), _description_head(job, 200)])
+    return hashlib.md5(key.encode("utf-8")).hexdigest()
+
+
+def _description_head(job, chars: int) -> str:
+    if isinstance(job, JobListing):
+        # only decompress the part that's needed
+        return job.description_head(chars)
+    return job.get("description", "")[:chars]
+
+
+def _listing_text(job) -> str:
+    return f"{job.get('title', '')} at {job.get('company', '')}. {_description_head(job, DESCRIPTION_CHARS)}"
+
+
+def embed_listings(jobs: list[dict], query: str | None = None):
+    """Normalised embeddings for the listings (cached per listing id) and the optional query.
+
+    Everything not cached yet is encoded in a single batch.
+    """
+    ids = [listing_id(job) for job in jobs]
+    with _lock:
+        # keep the hits now, they may be evicted by another thread before we're done
+        found = {cid: _embeddings[cid] for cid in ids if cid in _embeddings}
+    missing = {i: job for i, job in zip(ids, jobs) if i not in found}
+
+    texts = [_listing_text(job) for job in missing.values()]
+    if query is not None:
+        texts.append(query)
+    vectors = retriever.get_embedder().encode(
+        texts, batch_size=64, normalize_embeddings=True, show_progress_bar=False
+    ) if texts else np.empty((0, 0), dtype=np.float32)
+
+    with _lock:
+        for cid, vec in zip(missing, vectors):
+            found[cid] = _embeddings[cid] = np.asarray(vec, dtype=np.float32)
+        for cid in ids:
+            _embeddings[cid] = found[cid]  # re-adds a hit evicted meanwhile, and marks it recently used
+            _embeddings.move_to_end(cid)
+        while len(_embeddings) > EMBED_CACHE_SIZE:
+            _embeddings.popitem(last=False)
+
+    return np.stack([found[cid] for cid in ids]), (vectors[-1] if query is not None else None)
+
+
+def rank_jobs(jobs: list[dict], goal: str, skills: list[str] | None = None,
+              threshold: float = DUPLICATE_THRESHOLD) -> list[dict]:
+    """Return the listings sorted by relevance to goal (+ skills) with near-duplicates removed.
+
+    Each returned listing is a copy with a `relevance` score. If embedding
+    fails the listings come back unchanged.
+
+    The agent ranks by goal alone: the jobs task runs alongside the skills
+    task rather than after it, so skills aren't known yet when it ranks.
+    """
+    if len(jobs) < 2:
+        return jobs
+
+    query = goal if not skills else f"{goal}. Skills: {', '.join(skills)}"
+    try:
+        matrix, goal_vec = embed_listings(jobs, query)
+    except Exception as e:
+        print(f"Error ranking jobs: {e}")
+        return jobs
+
+    scores = matrix @ goal_vec
+    order = np.argsort(-scores, kind="stable")
+
+    # walk in rank order and drop anything too close to a listing already kept,
+    # so the best-scoring copy of a repost is the one that survives
+    sims = matrix @ matrix.T
+    kept = []
+    for i in order:
+        if kept and sims[i, kept].max() >= threshold:
+            continue
+        kept.append(i)
+
+    return [_with_relevance(jobs[i], round(float(scores[i]), 3)) for i in kept]
+
+
+def _with_relevance(job, score):
+    if isinstance(job, JobListing):
+        return job.with_relevance(score)
+    return dict(job, relevance=score)
@@ -0,0 +1,424 @@
+"""
+Retries, hedging, circuit breaking and rate limiting for the upstream APIs.
+
+Every call to JSearch, SerpAPI or the HF inference API goes through the
+`Upstream` for that API:
+
+- a token bucket keeps us under the API's request quota,
+- a circuit breaker fails fast (CircuitOpen) while the API keeps failing,
+- 429/5xx/timeouts are retried with jittered exponential backoff,
+- optionally a second, hedged request is sent when the first one is slower
+  than the recent p95, and whichever answers first wins.
+
+State is kept in plain counters (`stats()`, and Prometheus text via the
+telemetry metrics endpoint) so it's visible when a breaker opens.
+"""
+from __future__ import annotations
+import asyncio, concurrent.futures, contextlib, contextvars, os, random, threading, time, weakref
+from collections import deque
+import httpx
+import telemetry
+
+
+class UpstreamError(Exception):
+    """An upstream answered with a status worth retrying (429 or 5xx)."""
+
+    def __init__(self, upstream: str, status: int, retry_after: float | None = None):
+        super().__init__(f"{upstream} returned HTTP {status}")
+        self.status = status
+        self.retry_after = retry_after
+
+
+class CircuitOpen(Exception):
+    """The upstream's breaker is open, the call was not attempted."""
+
+
+def check_response(upstream: str, resp: httpx.Response) -> httpx.Response:
+    """Raise UpstreamError for a 429/5xx response, return it otherwise."""
+    if resp.status_code == 429 or resp.status_code >= 500:
+        raise UpstreamError(upstream, resp.status_code, _retry_after(resp.headers.get("retry-after")))
+    return resp
+
+
+def _retry_after(value):
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None  # HTTP-date form, just use our own backoff
+
+
+def _status(exc):
+    status = getattr(exc, "status", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status
+
+
+def retryable(exc: BaseException) -> bool:
+    """429, 5xx, timeouts and connection errors are worth another try, anything else isn't."""
+    status = _status(exc)
+    if isinstance(status, int):
+        return status == 429 or status >= 500
+    return isinstance(exc, (httpx.TransportError, TimeoutError, ConnectionError))
+
+
+# defaults for every upstream, override per upstream with configure()
+DEFAULTS = {
+    "rate": 0.0,           # requests per second, 0 = unlimited
+    "concurrency": 0,      # requests in flight at once, 0 = unlimited
+    "burst": 5,            # requests allowed back to back before the rate applies
+    "attempts": int(os.getenv("RETRY_ATTEMPTS", 3)),
+    "backoff": float(os.getenv("RETRY_BACKOFF", 0.5)),         # seconds, doubled per retry
+    "max_backoff": float(os.getenv("RETRY_MAX_BACKOFF", 8)),
+    "failures": int(os.getenv("BREAKER_FAILURES", 5)),          # consecutive failures that open the breaker
+    "cooldown": float(os.getenv("BREAKER_COOLDOWN", 30)),       # seconds before a trial call is let through
+    "hedge": False,
+    "hedge_quantile": 0.95,
+    "hedge_min_delay": float(os.getenv("HEDGE_MIN_DELAY", 0.5)),  # never hedge sooner than this
+    "hedge_min_samples": 20,   # latencies needed before the quantile is trusted
+}
+
+
+class Upstream:
+    """Resilience state for one upstream API."""
+
+    def __init__(self, name: str, **options):
+        unknown = set(options) - set(DEFAULTS)
+        if unknown:
+            raise ValueError(f"Unknown upstream options: {sorted(unknown)}")
+        self.name = name
+        self.options = {**DEFAULTS, **options}
+        self._lock = threading.Lock()
+        self._tokens = float(self.options["burst"])
+        self._refilled = time.monotonic()
+        self._state = "closed"
+        self._consecutive = 0
+        self._opened_at = 0.0
+        self._trial = False
+        self._latencies = deque(maxlen=200)
+        self._slots = None                          # threading semaphore for call()
+        self._aslots = weakref.WeakKeyDictionary()  # loop -> asyncio semaphore for acall()
+        self.stats = {"calls": 0, "successes": 0, "failures": 0, "retries": 0, "rejected": 0,
+                      "throttled": 0, "hedges": 0, "hedge_wins": 0, "breaker_opens": 0}
+
+    def configure(self, **options):
+        unknown = set(options) - set(DEFAULTS)
+        if unknown:
+            raise ValueError(f"Unknown upstream options: {sorted(unknown)}")
+        with self._lock:
+            self.options.update(options)
+            if "concurrency" in options:
+                # new limits apply to calls made from now on
+                self._slots, self._aslots = None, weakref.WeakKeyDictionary()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == "open" and time.monotonic() - self._opened_at >= self.options["cooldown"]:
+                return "half_open"
+            return self._state
+
+    # circuit breaker
+
+    def _admit(self):
+        """Raise CircuitOpen unless a call may go out now."""
+        with self._lock:
+            self.stats["calls"] += 1
+            if self._state == "closed":
+                return
+            if time.monotonic() - self._opened_at >= self.options["cooldown"] and not self._trial:
+                self._trial = True  # half open: one call finds out whether it's back
+                return
+            self.stats["rejected"] += 1
+        raise CircuitOpen(f"{self.name} is failing, not calling it for now")
+
+    def _succeeded(self, seconds: float):
+        with self._lock:
+            self.stats["successes"] += 1
+            self._latencies.append(seconds)
+            self._consecutive = 0
+            self._state, self._trial = "closed", False
+
+    def _failed(self, exc):
+        with self._lock:
+            self.stats["failures"] += 1
+            if not retryable(exc):
+                # a 401 or a bad request says nothing about whether the API is up
+                self._trial = False
+                return
+            self._consecutive += 1
+            if self._trial or (self._state == "closed" and self._consecutive >= self.options["failures"]):
+                if self._state != "open" or self._trial:
+                    self.stats["breaker_opens"] += 1
+                self._state, self._opened_at, self._trial = "open", time.monotonic(), False
+                print(f"→ Circuit breaker for {self.name} opened after {self._consecutive} failures")
+
+    # rate limiting
+
+    def _reserve(self, wait: bool = True) -> float | None:
+        """Take a token, returning how long to sleep for it (None if wait=False and none is free)."""
+        rate = self.options["rate"]
+        if not rate:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.options["burst"], self._tokens + (now - self._refilled) * rate)
+            self._refilled = now
+            if self._tokens < 1 and not wait:
+                return None
+            # going negative queues the caller behind everyone already waiting
+            self._tokens -= 1
+            delay = max(0.0, -self._tokens / rate)
+            if delay:
+                self.stats["throttled"] += 1
+            return delay
+
+    # retries and hedging
+
+    def _backoff(self, attempt: int, exc) -> float:
+        delay = random.uniform(0, min(self.options["max_backoff"], self.options["backoff"] * 2 ** attempt))
+        retry_after = getattr(exc, "retry_after", None)
+        if retry_after:
+            delay = max(delay, min(retry_after, self.options["max_backoff"]))
+        return delay
+
+    def hedge_delay(self) -> float | None:
+        """Seconds to wait for the first request before hedging (None = don't hedge)."""
+        if not self.options["hedge"]:
+            return None
+        with self._lock:
+            samples = sorted(self._latencies)
+        if len(samples) < self.options["hedge_min_samples"]:
+            return None
+        quantile = samples[min(len(samples) - 1, int(len(samples) * self.options["hedge_quantile"]))]
+        return max(quantile, self.options["hedge_min_delay"])
+
+    def call(self, fn, *args, hedge: bool = True, **kwargs):
+        """Call fn with rate limiting, breaker, retries and (if enabled) hedging."""
+        last = None
+        for attempt in range(self.options["attempts"]):
+            if attempt:
+                self.stats["retries"] += 1
+                telemetry.record(retries=1)
+                time.sleep(self._backoff(attempt - 1, last))
+            self._admit()
+            time.sleep(self._reserve())
+            try:
+                return self._attempt(fn, args, kwargs, hedge)
+            except Exception as e:
+                last = e
+                if not retryable(e):
+                    raise
+        raise last
+
+    def _attempt(self, fn, args, kwargs, hedge):
+        delay = self.hedge_delay() if hedge else None
+        if delay is None:
+            return self._timed(fn, *args, **kwargs)
+
+        # both copies run in the caller's context so they record into its span
+        first = _hedge_pool.submit(contextvars.copy_context().run, self._timed, fn, *args, **kwargs)
+        done, _ = concurrent.futures.wait([first], timeout=delay)
+        if done or self._reserve(wait=False) is None:
+            return first.result()
+
+        self.stats["hedges"] += 1
+        telemetry.record(hedged=True)
+        second = _hedge_pool.submit(contextvars.copy_context().run, self._timed, fn, *args, **kwargs)
+        error = None
+        for fut in concurrent.futures.as_completed([first, second]):
+            try:
+                result = fut.result()
+            except Exception as e:
+                error = error or e
+                continue
+            if fut is second:
+                self.stats["hedge_wins"] += 1
+            # a blocking call can't be cancelled, the slower copy just finishes in the background
+            return result
+        raise error
+
+    def _timed(self, fn, *args, **kwargs):
+        slots = self._thread_slots()
+        with slots if slots is not None else contextlib.nullcontext():
+            started = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                self._failed(e)
+                raise
+        self._succeeded(time.perf_counter() - started)
+        return result
+
+    def call_stream(self, fn, *args, **kwargs):
+        """call() for a fn that returns an iterator (a streamed response), as a generator.
+
+        Only opening the stream is retried, and it is never hedged. The
+        concurrency slot is held, and success (with its latency) or failure
+        recorded, only once the stream is exhausted or breaks; a consumer that
+        stops early gives the slot back without counting either.
+        """
+        last = None
+        for attempt in range(self.options["attempts"]):
+            if attempt:
+                self.stats["retries"] += 1
+                telemetry.record(retries=1)
+                time.sleep(self._backoff(attempt - 1, last))
+            self._admit()
+            time.sleep(self._reserve())
+            slots = self._thread_slots()
+            if slots is not None:
+                slots.acquire()
+            started = time.perf_counter()
+            try:
+                chunks = iter(fn(*args, **kwargs))
+                break
+            except Exception as e:
+                if slots is not None:
+                    slots.release()
+                self._failed(e)
+                last = e
+                if not retryable(e):
+                    raise
+        else:
+            raise last
+
+        try:
+            yield from chunks
+        except Exception as e:
+            self._failed(e)
+            raise
+        else:
+            self._succeeded(time.perf_counter() - started)
+        finally:
+            if slots is not None:
+                slots.release()
+
+    def _thread_slots(self):
+        if not self.options["concurrency"]:
+            return None
+        with self._lock:
+            if self._slots is None:
+                self._slots = threading.BoundedSemaphore(self.options["concurrency"])
+            return self._slots
+
+    def _loop_slots(self):
+        # asyncio semaphores belong to one event loop, so there's one per loop
+        if not self.options["concurrency"]:
+            return None
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            slots = self._aslots.get(loop)
+            if slots is None:
+                slots = self._aslots[loop] = asyncio.Semaphore(self.options["concurrency"])
+            return slots
+
+    async def acall(self, fn, *args, hedge: bool = True, **kwargs):
+        """Async version of call(): fn is a coroutine function."""
+        last = None
+        for attempt in range(self.options["attempts"]):
+            if attempt:
+                self.stats["retries"] += 1
+                telemetry.record(retries=1)
+                await asyncio.sleep(self._backoff(attempt - 1, last))
+            self._admit()
+            await asyncio.sleep(self._reserve())
+            try:
+                return await self._aattempt(fn, args, kwargs, hedge)
+            except Exception as e:
+                last = e
+                if not retryable(e):
+                    raise
+        raise last
+
+    async def _aattempt(self, fn, args, kwargs, hedge):
+        delay = self.hedge_delay() if hedge else None
+        if delay is None:
+            return await self._atimed(fn, *args, **kwargs)
+
+        first = asyncio.ensure_future(self._atimed(fn, *args, **kwargs))
+        done, _ = await asyncio.wait([first], timeout=delay)
+        if done or self._reserve(wait=False) is None:
+            return await first
+
+        self.stats["hedges"] += 1
+        telemetry.record(hedged=True)
+        second = asyncio.ensure_future(self._atimed(fn, *args, **kwargs))
+        pending, error = {first, second}, None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        error = error or task.exception()
+                        continue
+                    if task is second:
+                        self.stats["hedge_wins"] += 1
+                    return task.result()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _atimed(self, fn, *args, **kwargs):
+        slots = self._loop_slots()
+        async with slots if slots is not None else contextlib.nullcontext():
+            started = time.perf_counter()
+            try:
+                result = await fn(*args, **kwargs)
+            except asyncio.CancelledError:
+                raise  # the losing hedge, not a failure
+            except Exception as e:
+                self._failed(e)
+                raise
+        self._succeeded(time.perf_counter() - started)
+        return result
+
+
+_hedge_pool = concurrent.futures.ThreadPoolExecutor(max_workers=8, thread_name_prefix="hedge")
+
+# quotas: JSEARCH_RATE / SERPAPI_RATE / HF_RATE requests per second and
+# *_CONCURRENCY requests in flight (0 = no limit); every upstream bills each request, and a
+# hedged duplicate can't be taken back, so hedging is opt-in (HEDGE_SEARCH=1, HEDGE_LLM=1)
+upstreams = {
+    "jsearch": Upstream("jsearch", rate=float(os.getenv("JSEARCH_RATE", 5)),
+                        concurrency=int(os.getenv("JSEARCH_CONCURRENCY", 0)),
+                        hedge=os.getenv("HEDGE_SEARCH", "0") != "0"),
+    "serpapi": Upstream("serpapi", rate=float(os.getenv("SERPAPI_RATE", 5)),
+                        concurrency=int(os.getenv("SERPAPI_CONCURRENCY", 0)),
+                        hedge=os.getenv("HEDGE_SEARCH", "0") != "0"),
+    "hf": Upstream("hf", rate=float(os.getenv("HF_RATE", 0)),
+                   concurrency=int(os.getenv("HF_CONCURRENCY", 0)),
+                   hedge=os.getenv("HEDGE_LLM", "0") != "0"),
+}
+
+
+def upstream(name: str) -> Upstream:
+    return upstreams[name]
+
+
+def configure(name: str, **options):
+    """Change rate, retry, breaker or hedging options for one upstream."""
+    upstreams[name].configure(**options)
+
+
+def stats() -> dict:
+    """{upstream: counters + breaker state}"""
+    return {name: {**u.stats, "state": u.state} for name, u in upstreams.items()}
+
+
+def to_prometheus(prefix: str = "job_assistant") -> str:
+    """Counters and breaker state in Prometheus text format."""
+    snapshot = stats()
+    lines = []
+    for field in next(iter(upstreams.values())).stats:
+        lines.append(f"# TYPE {prefix}_upstream_{field}_total counter")
+        for name, s in snapshot.items():
+            lines.append(f'{prefix}_upstream_{field}_total{{upstream="{name}"}} {s[field]}')
+    lines.append(f"# TYPE {prefix}_upstream_breaker_open gauge")
+    for name, s in snapshot.items():
+        lines.append(f'{prefix}_upstream_breaker_open{{upstream="{name}"}} {int(s["state"] != "closed")}')
+    return "\n".join(lines) + "\n"
+
+
+telemetry.add_collector(to_prometheus)
@@ -0,0 +1,119 @@
+"""
+Finished agent results kept in memory, so a Streamlit rerun re-renders them
+instead of running the agent again.
+
+`store` is shared by every session in the process; each session also keeps
+its own small `ResultStore` in st.session_state. Both are LRUs bounded by an
+estimate of the bytes they hold rather than by entry count, since one result
+with long descriptions can be many times the size of another.
+"""
+from __future__ import annotations
+import json, os, re, threading, time
+from collections import OrderedDict
+
+
+def normalize_title(title: str) -> str:
+    """Key for a job title: lowercase, single spaces, no surrounding punctuation."""
+    return re.sub(r"\s+", " ", title or "").strip(" .,;:!?").lower()
+
+
+def result_size(result) -> int:
+    """Rough size of a result in bytes (its JSON encoding, listings at their compressed size)."""
+    listings = 0
+
+    def encode(obj):
+        nonlocal listings
+        if hasattr(obj, "nbytes"):
+            listings += obj.nbytes
+            return None
+        return str(obj)
+
+    return len(json.dumps(result, ensure_ascii=False, default=encode).encode("utf-8")) + listings
+
+
+def failed(result) -> bool:
+    """True if the resume or cover letter came back as an error message, or a search couldn't be run.
+
+    A failed job search leaves an "Error:" placeholder listing and a failed
+    post search leaves None, so neither is kept as if nothing had been found.
+    """
+    if any(isinstance(result.get(k), str) and result[k].startswith("Error:") for k in ("resume", "cover")):
+        return True
+    if any(str(job.get("title", "")).startswith("Error:") for job in result.get("jobs") or []):
+        return True
+    return "posts" in result and result["posts"] is None
+
+
+class ResultStore:
+    """Thread-safe LRU of run_agent results keyed by normalised job title."""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, ttl: float | None = None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.bytes = 0
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, tuple] = OrderedDict()  # key -> (result, size, stored_at)
+
+    def get(self, title: str):
+        entry = self.get_entry(title)
+        return entry[0] if entry is not None else None
+
+    def get_entry(self, title: str):
+        """(result, age in seconds) or None if missing or expired."""
+        key = normalize_title(title)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl is not None and time.time() - entry[2] > self.ttl:
+                self._drop(key)
+                entry = None
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry[0], time.time() - entry[2]
+
+    def age(self, title: str):
+        """Seconds since the title was stored (None if it isn't), without counting as a hit."""
+        with self._lock:
+            entry = self._entries.get(normalize_title(title))
+            return time.time() - entry[2] if entry is not None else None
+
+    def put(self, title: str, result):
+        key = normalize_title(title)
+        size = result_size(result)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            if size > self.max_bytes:
+                return  # would evict everything else and still not fit
+            self._entries[key] = (result, size, time.time())
+            self.bytes += size
+            self.stats["stores"] += 1
+            while self.bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.stats["evictions"] += 1
+
+    def discard(self, title: str):
+        with self._lock:
+            self._drop(normalize_title(title))
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[1]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, title):
+        return normalize_title(title) in self._entries
+
+
+# process-wide store, RESULT_STORE_MB of results for up to RESULT_STORE_TTL seconds
+# (job listings go stale, so results aren't kept forever)
+store = ResultStore(
+    max_bytes=int(float(os.getenv("RESULT_STORE_MB", 64)) * 1024 * 1024),
+    ttl=float(os.getenv("RESULT_STORE_TTL", 3600)),
+)
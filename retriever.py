@@ -1,45 +1,238 @@
+"""
+Caption store: sentence embeddings in a Chroma collection, or in an
+in-process NumPy index (RETRIEVER_BACKEND=numpy).
+
+The embedding model and the stores are heavy, so they are only created on
+first use (or by warm_up()) behind a lock.
+"""
 from __future__ import annotations
-import chromadb, hashlib, pathlib, numpy as np
+import hashlib, os, pathlib, threading, numpy as np
 from dotenv import load_dotenv
-from sentence_transformers import SentenceTransformer
 
 load_dotenv()
 
 CHROMA_DIR = pathlib.Path(".chroma_viralvisor")
+VECTOR_DIR = pathlib.Path(".vectors_viralvisor")
 COLL_NAME  = "captions"
+MODEL_NAME = "all-MiniLM-L6-v2"
+BACKEND    = os.getenv("RETRIEVER_BACKEND", "chroma")  # "chroma" or "numpy"
+
+_lock = threading.RLock()
+_embedder = None
+_client = None
+_coll = None
+_index = None
+
+
+def get_embedder():
+    """The SentenceTransformer model, loaded on first call."""
+    global _embedder
+    if _embedder is None:
+        with _lock:
+            if _embedder is None:
+                from sentence_transformers import SentenceTransformer
+                _embedder = SentenceTransformer(MODEL_NAME)
+    return _embedder
 
-embedder = SentenceTransformer('all-MiniLM-L6-v2')
 
 # embedding function for hugging face 
 class HFEmbeddingFunction:
     def __call__(self, texts):
-        return embedder.encode(texts).tolist()
+        return get_embedder().encode(texts).tolist()
 
 embedding_function = HFEmbeddingFunction() 
 
-client = chromadb.PersistentClient(path=str(CHROMA_DIR)) #chroma db for storing captions
 
-try:
-    # Try to get the collection
-    coll = client.get_collection(COLL_NAME, embedding_function=embedding_function)
-except chromadb.errors.NotFoundError:
-    # Create collection if not found
-    coll = client.create_collection(COLL_NAME, embedding_function=embedding_function)
+def get_client():
+    """Chroma db for storing captions, opened on first call."""
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                import chromadb
+                _client = chromadb.PersistentClient(path=str(CHROMA_DIR))
+    return _client
+
+
+def get_collection():
+    """The captions collection, created if it doesn't exist yet."""
+    global _coll
+    if _coll is None:
+        with _lock:
+            if _coll is None:
+                import chromadb
+                client = get_client()
+                try:
+                    # Try to get the collection
+                    _coll = client.get_collection(COLL_NAME, embedding_function=embedding_function)
+                except chromadb.errors.NotFoundError:
+                    # Create collection if not found
+                    _coll = client.create_collection(COLL_NAME, embedding_function=embedding_function)
+    return _coll
+
+
+def get_index():
+    """The NumPy index used by the "numpy" backend, mmapped on first call."""
+    global _index
+    if _index is None:
+        with _lock:
+            if _index is None:
+                from vecindex import NumpyIndex
+                _index = NumpyIndex(VECTOR_DIR)
+    return _index
+
+
+def warm_up(background: bool = True, store: bool = True):
+    """Load the model and (unless store=False) open the store ahead of the first request."""
+    def load():
+        get_embedder()
+        if not store:
+            return
+        if BACKEND == "numpy":
+            get_index()
+        else:
+            get_collection()
+
+    if not background:
+        load()
+        return None
+    thread = threading.Thread(target=load, name="retriever-warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+def __getattr__(name):
+    # retriever.embedder / .client / .coll still work, they just load lazily now
+    if name == "embedder":
+        return get_embedder()
+    if name == "client":
+        return get_client()
+    if name == "coll":
+        return get_collection()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+_count = None  # cached coll.count(), reset whenever we write
+
+
+def _coll_count() -> int:
+    global _count
+    if _count is None:
+        _count = get_collection().count()
+    return _count
+
+
+def _caption_id(text: str) -> str:
+    return hashlib.md5(text.encode("utf-8")).hexdigest()
+
 
 def add_caption(text: str):
     """Add caption text to vector DB (id = md5 hash)."""
-    cid = hashlib.md5(text.encode("utf-8")).hexdigest()
+    if BACKEND == "numpy":
+        _index_add([text])
+        return
+    global _count
+    import chromadb
+    cid = _caption_id(text)
     try:
-        coll.add(ids=[cid], documents=[text])
+        get_collection().add(ids=[cid], documents=[text])
     except chromadb.errors.IDAlreadyExistsError:
         pass
+    _count = None
+
+
+def add_captions(texts, batch_size: int = 256) -> int:
+    """Add many caption texts at once, returns how many were new.
+
+    Duplicates are dropped by md5 first, existing ids are looked up in one
+    query, and only the new texts are embedded (in batches) and written.
+    """
+    if BACKEND == "numpy":
+        return _index_add(texts, batch_size)
+
+    unique = {}
+    for text in texts:
+        unique.setdefault(_caption_id(text), text)
+    if not unique:
+        return 0
+
+    global _count
+    coll = get_collection()
+    existing = set(coll.get(ids=list(unique), include=[])["ids"])
+    new_ids = [cid for cid in unique if cid not in existing]
+    if not new_ids:
+        return 0
+
+    docs = [unique[cid] for cid in new_ids]
+    embeddings = get_embedder().encode(docs, batch_size=batch_size, show_progress_bar=False)
+
+    # one write unless chroma's own per-call limit is smaller than the batch
+    step = get_client().get_max_batch_size()
+    for start in range(0, len(new_ids), step):
+        coll.upsert(
+            ids=new_ids[start:start + step],
+            documents=docs[start:start + step],
+            embeddings=embeddings[start:start + step].tolist(),
+        )
+    _count = None
+    return len(new_ids)
 
 
 # computer similarity betw the input text and stored caption
 def similarity(text: str, k: int = 5) -> float:
     """Return similarity 0-1 (higher = more similar)."""
-    if coll.count() == 0:
+    if BACKEND == "numpy":
+        return _index_similarity([text], k)[0]
+    n = _coll_count()
+    if n == 0:
         return 0.0
-    res = coll.query(query_texts=[text], n_results=min(k, coll.count()))
+    res = get_collection().query(query_texts=[text], n_results=min(k, n))
     dists = res["distances"][0]
-    return round(1 / (1 + np.mean(dists)), 3)
\ No newline at end of file
+    return round(1 / (1 + np.mean(dists)), 3)
+
+
+def similarity_many(texts, k: int = 5) -> list[float]:
+    """similarity() for many texts: one encode batch and one multi-query."""
+    texts = list(texts)
+    if not texts:
+        return []
+    if BACKEND == "numpy":
+        return _index_similarity(texts, k)
+    n = _coll_count()
+    if n == 0:
+        return [0.0] * len(texts)
+
+    embeddings = get_embedder().encode(texts, show_progress_bar=False)
+    res = get_collection().query(query_embeddings=embeddings.tolist(), n_results=min(k, n), include=["distances"])
+    dists = np.asarray(res["distances"], dtype=np.float32)  # (len(texts), k)
+    scores = 1 / (1 + dists.mean(axis=1))
+    return np.round(scores, 3).tolist()
+
+
+# numpy backend: same ids and the same score as chroma's default l2 space
+
+def _index_add(texts, batch_size: int = 256) -> int:
+    index = get_index()
+    unique = {}
+    for text in texts:
+        cid = _caption_id(text)
+        if cid not in index:
+            unique.setdefault(cid, text)
+    if not unique:
+        return 0
+    embeddings = get_embedder().encode(
+        list(unique.values()), batch_size=batch_size, normalize_embeddings=True, show_progress_bar=False
+    )
+    return index.add(list(unique), embeddings)
+
+
+def _index_similarity(texts, k: int) -> list[float]:
+    index = get_index()
+    if len(index) == 0:
+        return [0.0] * len(texts)
+    queries = get_embedder().encode(texts, normalize_embeddings=True, show_progress_bar=False)
+    _, sims = index.search(queries, k)
+    # squared l2 between unit vectors, which is what chroma reports as distance
+    dists = 2 - 2 * sims
+    scores = 1 / (1 + dists.mean(axis=1))
+    return np.round(scores, 3).tolist()
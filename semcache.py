@@ -0,0 +1,163 @@
+"""
+Semantic cache: serve a result generated for a goal that means the same thing.
+
+"SWE NYC" and "Software Engineer in New York" miss every exact-match cache;
+here goals are embedded with the retriever model and a stored result is
+reused when the closest previous goal is at least `threshold` similar.
+"""
+from __future__ import annotations
+import functools, json, pathlib, sqlite3, threading, time
+from collections import deque
+import numpy as np
+import retriever
+from cache import CACHE_DB
+
+HISTOGRAM_BINS = np.round(np.arange(0.0, 1.0001, 0.05), 2)
+
+
+@functools.lru_cache(maxsize=1024)
+def embed_goal(goal: str) -> np.ndarray:
+    """Unit-length embedding of a goal (cached, the three LLM tools share it)."""
+    text = " ".join(goal.lower().split())
+    vec = retriever.get_embedder().encode([text], normalize_embeddings=True, show_progress_bar=False)[0]
+    vec = np.asarray(vec, dtype=np.float32)
+    vec.setflags(write=False)
+    return vec
+
+
+class SemanticCache:
+    """Per-tool nearest-goal lookup over results stored in SQLite."""
+
+    def __init__(self, table: str = "semantic_results", path=CACHE_DB, threshold: float = 0.9,
+                 ttl: float = 7 * 24 * 3600, max_rows: int = 2000):
+        if not table.isidentifier():
+            raise ValueError(f"Invalid cache table name: {table}")
+        self.table = table
+        self.path = pathlib.Path(path)
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self.stats = {"hits": 0, "misses": 0, "stores": 0}
+        self.similarities = deque(maxlen=10000)  # best match per lookup, for tuning the threshold
+        self._similarity_counts = np.zeros(len(HISTOGRAM_BINS) - 1, dtype=np.int64)  # all lookups, for /metrics
+        self._similarity_sum = 0.0
+        self._lock = threading.Lock()
+        self._db = None
+        self._tools: dict[str, dict] = {}  # tool -> {"matrix", "values", "goals", "stored_at"}
+
+    def _conn(self):
+        if self._db is None:
+            self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._db.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} (id INTEGER PRIMARY KEY, tool TEXT NOT NULL, "
+                "goal TEXT NOT NULL, embedding BLOB NOT NULL, value TEXT NOT NULL, stored_at REAL NOT NULL)"
+            )
+            self._db.commit()
+        return self._db
+
+    def _entries(self, tool: str) -> dict:
+        """In-memory matrix of a tool's stored goals, loaded from disk on first use."""
+        entries = self._tools.get(tool)
+        if entries is None:
+            rows = self._conn().execute(
+                f"SELECT goal, embedding, value, stored_at FROM {self.table} "
+                "WHERE tool = ? AND stored_at >= ? ORDER BY stored_at",
+                (tool, time.time() - self.ttl),
+            ).fetchall()
+            vectors = [np.frombuffer(row[1], dtype=np.float32) for row in rows]
+            entries = {
+                "goals": [row[0] for row in rows],
+                "matrix": np.stack(vectors) if vectors else None,
+                "values": [json.loads(row[2]) for row in rows],
+                "stored_at": [row[3] for row in rows],
+            }
+            self._tools[tool] = entries
+        return entries
+
+    def lookup(self, tool: str, goal: str):
+        """Return (value, similarity, matched goal) for the closest fresh goal, or None."""
+        vec = embed_goal(goal)
+        with self._lock:
+            entries = self._entries(tool)
+            best, idx = 0.0, -1
+            if entries["matrix"] is not None:
+                sims = entries["matrix"] @ vec
+                # expired rows stay in memory until the next reload, just never match
+                sims[np.asarray(entries["stored_at"]) < time.time() - self.ttl] = -1.0
+                # the newest of equally close goals wins, so a refreshed result replaces the old one
+                idx = len(sims) - 1 - int(np.argmax(sims[::-1]))
+                best = float(sims[idx])
+            self.similarities.append(best)
+            self._similarity_counts[min(int(max(best, 0.0) / 0.05), len(self._similarity_counts) - 1)] += 1
+            self._similarity_sum += best
+
+            if idx >= 0 and best >= self.threshold:
+                self.stats["hits"] += 1
+                return entries["values"][idx], best, entries["goals"][idx]
+            self.stats["misses"] += 1
+            return None
+
+    def store(self, tool: str, goal: str, value):
+        """Remember a result for a goal."""
+        vec = embed_goal(goal)
+        now = time.time()
+        raw = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            db = self._conn()
+            db.execute(
+                f"INSERT INTO {self.table} (tool, goal, embedding, value, stored_at) VALUES (?, ?, ?, ?, ?)",
+                (tool, goal, vec.tobytes(), raw, now),
+            )
+            db.execute(
+                f"DELETE FROM {self.table} WHERE id IN (SELECT id FROM {self.table} WHERE tool = ? "
+                "ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+                (tool, self.max_rows),
+            )
+            db.commit()
+            self.stats["stores"] += 1
+
+            # add the row to the loaded matrix too (not loaded yet = read from disk on first lookup)
+            entries = self._tools.get(tool)
+            if entries is not None:
+                matrix = vec[None, :] if entries["matrix"] is None else np.vstack([entries["matrix"], vec])
+                entries["goals"].append(goal)
+                entries["values"].append(json.loads(raw))  # the same copy a reload would give
+                entries["stored_at"].append(now)
+                drop = max(len(entries["goals"]) - self.max_rows, 0)
+                entries["matrix"] = matrix[drop:]
+                for key in ("goals", "values", "stored_at"):
+                    del entries[key][:drop]
+
+    def report(self) -> dict:
+        """Hit rate and how similar the best matches were, to help pick a threshold."""
+        total = self.stats["hits"] + self.stats["misses"]
+        sims = np.asarray(self.similarities, dtype=np.float32)
+        counts, _ = np.histogram(np.clip(sims, 0.0, 1.0), bins=HISTOGRAM_BINS)
+        return {
+            **self.stats,
+            "hit_rate": round(self.stats["hits"] / total, 3) if total else 0.0,
+            "threshold": self.threshold,
+            "similarity_p50": round(float(np.percentile(sims, 50)), 3) if len(sims) else None,
+            "similarity_p90": round(float(np.percentile(sims, 90)), 3) if len(sims) else None,
+            "histogram": {f"{lo:.2f}-{hi:.2f}": int(c)
+                          for lo, hi, c in zip(HISTOGRAM_BINS[:-1], HISTOGRAM_BINS[1:], counts)},
+        }
+
+    def to_prometheus(self, prefix: str = "job_assistant") -> str:
+        """Lookup counters and the best-match similarity histogram in Prometheus text format."""
+        with self._lock:
+            stats, counts, total = dict(self.stats), self._similarity_counts.copy(), self._similarity_sum
+        lines = []
+        for field, value in stats.items():
+            lines.append(f"# TYPE {prefix}_semantic_cache_{field}_total counter")
+            lines.append(f"{prefix}_semantic_cache_{field}_total {value}")
+        lines.append(f"# TYPE {prefix}_semantic_cache_threshold gauge")
+        lines.append(f"{prefix}_semantic_cache_threshold {self.threshold}")
+        lines.append(f"# TYPE {prefix}_semantic_cache_similarity histogram")
+        cumulative = np.cumsum(counts)
+        for hi, n in zip(HISTOGRAM_BINS[1:-1], cumulative[:-1]):
+            lines.append(f'{prefix}_semantic_cache_similarity_bucket{{le="{hi:.2f}"}} {n}')
+        lines.append(f'{prefix}_semantic_cache_similarity_bucket{{le="+Inf"}} {cumulative[-1]}')
+        lines.append(f"{prefix}_semantic_cache_similarity_sum {total:.3f}")
+        lines.append(f"{prefix}_semantic_cache_similarity_count {cumulative[-1]}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,214 @@
+"""
+Structured timing spans for the agent and its tools.
+
+A span is a plain dict (name, tool, start/end, duration, cache hit, bytes
+received, tokens requested/returned, retries, hedged, error). Code running inside a
+span adds to it with `record()`; finished spans feed the in-process
+histograms in `metrics` and any exporters, and can be exported as JSON lines
+or Prometheus text (`serve_metrics` exposes the latter over HTTP).
+"""
+from __future__ import annotations
+import contextlib, contextvars, json, os, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_current: contextvars.ContextVar = contextvars.ContextVar("span", default=None)
+_listener: contextvars.ContextVar = contextvars.ContextVar("span_listener", default=None)
+
+# fields that accumulate when recorded more than once
+COUNTERS = ("bytes_received", "tokens_requested", "tokens_returned", "retries")
+
+
+@contextlib.contextmanager
+def span(name: str, **attrs):
+    """Time a block; yields the span dict so callers can add fields directly."""
+    sp = {"name": name, "start": time.time(), "end": None, "duration_ms": None,
+          "cache_hit": None, "error": None, **{k: 0 for k in COUNTERS}, **attrs}
+    token = _current.set(sp)
+    started = time.perf_counter()
+    try:
+        yield sp
+    except BaseException as e:
+        sp["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current.reset(token)
+        sp["end"] = time.time()
+        sp["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        _finish(sp)
+
+
+def record(**fields):
+    """Add to the current span (no-op outside one). Counter fields are summed."""
+    sp = _current.get()
+    if sp is None:
+        return
+    for key, value in fields.items():
+        if key in COUNTERS:
+            sp[key] = sp.get(key, 0) + value
+        elif key == "cache_hit" and sp.get("cache_hit"):
+            continue  # one cached sub-call is enough to call the span a hit
+        else:
+            sp[key] = value
+
+
+def current():
+    return _current.get()
+
+
+@contextlib.contextmanager
+def listening(callback):
+    """Call `callback(span)` for every span that finishes inside this block (this context only)."""
+    token = _listener.set(callback)
+    try:
+        yield
+    finally:
+        _listener.reset(token)
+
+
+_exporters = []
+
+
+def add_exporter(fn):
+    """Call fn(span) for every finished span in the process."""
+    _exporters.append(fn)
+    return fn
+
+
+def remove_exporter(fn):
+    if fn in _exporters:
+        _exporters.remove(fn)
+
+
+_collectors = []
+
+
+def add_collector(fn):
+    """Append fn()'s Prometheus text (e.g. other modules' counters) to the /metrics page."""
+    _collectors.append(fn)
+    return fn
+
+
+def _finish(sp):
+    metrics.observe(sp)
+    listener = _listener.get()
+    if listener is not None:
+        listener(sp)
+    for fn in list(_exporters):
+        try:
+            fn(sp)
+        except Exception as e:
+            print(f"Error exporting span: {e}")
+
+
+def jsonl_exporter(path):
+    """Exporter appending every span as one JSON line to `path`."""
+    lock = threading.Lock()
+
+    def export(sp):
+        line = json.dumps(sp, ensure_ascii=False, default=str)
+        with lock, open(path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+    return export
+
+
+class Metrics:
+    """Per-span-name latency histograms and counters."""
+
+    BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._series: dict[tuple, dict] = {}
+
+    def observe(self, sp):
+        labels = (sp["name"], sp.get("tool") or "")
+        with self._lock:
+            s = self._series.get(labels)
+            if s is None:
+                s = self._series[labels] = {
+                    "buckets": [0] * (len(self.BUCKETS_MS) + 1), "count": 0, "sum_ms": 0.0,
+                    "cache_hits": 0, "errors": 0, **{k: 0 for k in COUNTERS},
+                }
+            idx = next((i for i, b in enumerate(self.BUCKETS_MS) if sp["duration_ms"] <= b), len(self.BUCKETS_MS))
+            s["buckets"][idx] += 1
+            s["count"] += 1
+            s["sum_ms"] += sp["duration_ms"]
+            s["cache_hits"] += bool(sp.get("cache_hit"))
+            s["errors"] += bool(sp.get("error"))
+            for k in COUNTERS:
+                s[k] += sp.get(k, 0) or 0
+
+    def snapshot(self) -> dict:
+        """{"name/tool": series} with a p50/p95 estimate from the histogram."""
+        with self._lock:
+            out = {}
+            for (name, tool), s in self._series.items():
+                out[f"{name}/{tool}" if tool else name] = {
+                    **{k: v for k, v in s.items() if k != "buckets"},
+                    "p50_ms": self._quantile(s, 0.5), "p95_ms": self._quantile(s, 0.95),
+                }
+            return out
+
+    def _quantile(self, s, q):
+        """Upper bound of the bucket holding quantile q (None if it's in the overflow bucket)."""
+        target, seen = q * s["count"], 0
+        for i, n in enumerate(s["buckets"]):
+            seen += n
+            if n and seen >= target:
+                return self.BUCKETS_MS[i] if i < len(self.BUCKETS_MS) else None
+        return None
+
+    def to_prometheus(self, prefix: str = "job_assistant") -> str:
+        """Prometheus text exposition format."""
+        lines = [f"# TYPE {prefix}_span_duration_seconds histogram"]
+        with self._lock:
+            series = sorted(self._series.items())
+            for (name, tool), s in series:
+                labels = f'span="{name}",tool="{tool}"'
+                cumulative = 0
+                for bound, n in zip(self.BUCKETS_MS + (None,), s["buckets"]):
+                    cumulative += n
+                    le = "+Inf" if bound is None else f"{bound / 1000:g}"
+                    lines.append(f'{prefix}_span_duration_seconds_bucket{{{labels},le="{le}"}} {cumulative}')
+                lines.append(f"{prefix}_span_duration_seconds_sum{{{labels}}} {s['sum_ms'] / 1000:.3f}")
+                lines.append(f"{prefix}_span_duration_seconds_count{{{labels}}} {s['count']}")
+            for field in ("cache_hits", "errors") + COUNTERS:
+                lines.append(f"# TYPE {prefix}_span_{field}_total counter")
+                for (name, tool), s in series:
+                    lines.append(f'{prefix}_span_{field}_total{{span="{name}",tool="{tool}"}} {s[field]}')
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+
+metrics = Metrics()
+
+
+def serve_metrics(port: int, host: str = "0.0.0.0"):
+    """Serve metrics.to_prometheus() at http://host:port/metrics on a daemon thread."""
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.rstrip("/") != "/metrics":
+                self.send_error(404)
+                return
+            body = "".join([metrics.to_prometheus()] + [fn() for fn in _collectors]).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
+
+
+# TRACE_JSONL=path appends every span in the process to that file
+if os.getenv("TRACE_JSONL"):
+    add_exporter(jsonl_exporter(os.getenv("TRACE_JSONL")))
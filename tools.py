@@ -1,27 +1,137 @@
-import os, re, requests
+import asyncio, functools, json, os, re, threading, httpx
+from concurrent.futures import Future
 from dotenv import load_dotenv
-from huggingface_hub import InferenceClient
-import streamlit as st
+from cache import Cache, make_key
+import aio, ranker, resilience, telemetry
+from archive import ListingArchive
+from listing import JobListing
+from semcache import SemanticCache
 load_dotenv()
 
-client = InferenceClient(token=os.getenv("HF_TOKEN")) # the Hugging Face Inference API client
+MODEL = "meta-llama/Llama-3.1-8B-Instruct"
+
+# upstream endpoints, overridable so the benchmark can point them at local stand-ins
+JSEARCH_URL = os.getenv("JSEARCH_URL", "https://jsearch.p.rapidapi.com/search")
+SERPAPI_URL = os.getenv("SERPAPI_URL", "https://serpapi.com/search")
+HF_BASE_URL = os.getenv("HF_BASE_URL")  # None = Hugging Face Inference API
+
+# what every failed generation returns; callers (and results.failed) check for the "Error:" prefix
+GENERATION_ERROR = "Error: Unable to generate content. Please try again."
+
+# identical prompts come back from here instead of the inference API
+llm_cache = Cache("llm_responses", ttl=float(os.getenv("LLM_CACHE_TTL", 7 * 24 * 3600)))
+
+class SingleFlight:
+    """Process-wide registry of in-flight calls.
+
+    Concurrent calls with the same key share one upstream request: the first
+    caller runs it and everyone else waits for the same result (or error).
+    Works for threads (`do`) and coroutines on any event loop (`ado`).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict[str, Future] = {}
+        self.stats = {"calls": 0, "shared": 0}
+
+    def _join(self, key):
+        with self._lock:
+            self.stats["calls"] += 1
+            fut = self._calls.get(key)
+            if fut is not None:
+                self.stats["shared"] += 1
+                return fut, False
+            fut = self._calls[key] = Future()
+            return fut, True
+
+    def _finish(self, key, fut, result=None, error=None):
+        with self._lock:
+            self._calls.pop(key, None)
+        if error is not None:
+            fut.set_exception(error)
+        else:
+            fut.set_result(result)
+
+    def do(self, key, fn, *args, **kwargs):
+        fut, leader = self._join(key)
+        if not leader:
+            return fut.result()
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            self._finish(key, fut, error=e)
+            raise
+        self._finish(key, fut, result)
+        return result
+
+    async def ado(self, key, fn, *args, **kwargs):
+        fut, leader = self._join(key)
+        if not leader:
+            return await asyncio.wrap_future(fut)
+        try:
+            result = await fn(*args, **kwargs)
+        except BaseException as e:
+            self._finish(key, fut, error=e)
+            raise
+        self._finish(key, fut, result)
+        return result
+
+
+inflight = SingleFlight()
 
+
+@functools.lru_cache(maxsize=None)
 def get_secret(name):
     try:
-        # get secret from Streamlit secrets
+        # get secret from Streamlit secrets (imported here, it's slow and only the app needs it)
+        import streamlit as st
         return st.secrets[name]
     except Exception:
         # Fallback to local .env
         return os.getenv(name)
 
-SERPAPI_KEY = get_secret("SERPAPI_KEY")
-RAPIDAPI_KEY = get_secret("RAPIDAPI_KEY")
-HF_TOKEN = get_secret("HF_TOKEN")
 
+_client = None
+_client_lock = threading.Lock()
 
-def generate_content(prompt, task_type="general", max_tokens=None):
-    """Generate content with task-specific parameters using Hugging Face Inference API"""
-    
+
+def get_client():
+    """The Hugging Face Inference API client, created on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from huggingface_hub import InferenceClient
+                _client = InferenceClient(token=get_secret("HF_TOKEN"), base_url=HF_BASE_URL)
+    return _client
+
+
+def warm_up(background: bool = True):
+    """Create the inference client and read the API keys ahead of the first request."""
+    def load():
+        get_client()
+        for name in ("SERPAPI_KEY", "RAPIDAPI_KEY"):
+            get_secret(name)
+
+    if not background:
+        load()
+        return None
+    thread = threading.Thread(target=load, name="tools-warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+def __getattr__(name):
+    # tools.client and the key constants still work, they are just resolved lazily
+    if name == "client":
+        return get_client()
+    if name in ("SERPAPI_KEY", "RAPIDAPI_KEY", "HF_TOKEN"):
+        return get_secret(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _chat_request(prompt, task_type="general", max_tokens=None):
+    """Build the chat messages, sampling config and cache key for a prompt."""
     configs = {
         'resume': {
             'max_tokens': 2000, # to get detailed resumes
@@ -38,6 +148,11 @@ def generate_content(prompt, task_type="general", max_tokens=None):
             'temperature': 0.2, # more focused on the terms
             'top_p': 0.8, # more deterministic output
         },
+        'bundle': {
+            'max_tokens': 3000, # skills, resume and cover letter in one JSON answer
+            'temperature': 0.3, # low enough to keep the JSON well-formed
+            'top_p': 0.85,
+        },
         'general': {
             'max_tokens': 1000, # the default maximum number of tokens for general tasks, not too long
             'temperature': 0.5, # default temperature for general tasks, which is a balance between creativity and focus
@@ -54,34 +169,122 @@ def generate_content(prompt, task_type="general", max_tokens=None):
         {"role": "system", "content": "You are a professional career advisor and resume writer."},
         {"role": "user", "content": prompt}
     ]
-    
+
+    key = make_key(MODEL, messages, task_type, config['max_tokens'], config['temperature'], config['top_p'])
+    return messages, config, key
+
+
+def generate_content(prompt, task_type="general", max_tokens=None, use_cache=True, on_token=None):
+    """Generate content with task-specific parameters using Hugging Face Inference API
+
+    If `on_token` is given the answer is streamed and each chunk is passed to it
+    as it arrives; the full text is still returned at the end. A failure,
+    including a stream cut off halfway, returns GENERATION_ERROR instead.
+    """
+    messages, config, key = _chat_request(prompt, task_type, max_tokens)
+    if use_cache:
+        cached = llm_cache.get(key)
+        if cached is not None:
+            telemetry.record(cache_hit=True)
+            if on_token is not None:
+                on_token(cached)
+            return cached
+
+    telemetry.record(cache_hit=False, tokens_requested=config['max_tokens'])
+    streamed = []
+
+    def call():
+        if on_token is None:
+            return _complete(messages, config, key)
+        try:
+            for chunk in _stream(messages, config, key):
+                streamed.append(chunk)
+                on_token(chunk)
+        except Exception:
+            # cut off (or never started): the partial text was shown, but it isn't an answer
+            return GENERATION_ERROR
+        return "".join(streamed).strip()
+
+    # an identical prompt already running (e.g. in another session) is shared, not repeated
+    text = inflight.do(key, call)
+    if on_token is not None and not streamed:
+        on_token(text)
+    return text
+
+
+def _complete(messages, config, key):
+    """One blocking chat completion; real answers are cached."""
     try:
         # Call Hugging Face Inference API, using this llama model because it's good at following instructions
-        response = client.chat_completion(
-            model="meta-llama/Llama-3.1-8B-Instruct",
+        # retried on 429/5xx, rate limited and failing fast while HF is down
+        response = resilience.upstream("hf").call(
+            get_client().chat_completion,
+            model=MODEL,
             messages=messages,
             max_tokens=config['max_tokens'],
             temperature=config['temperature'],
             top_p=config['top_p'],
         )
         
-        return response.choices[0].message.content.strip()
+        text = response.choices[0].message.content.strip()
+        usage = getattr(response, "usage", None)
+        telemetry.record(
+            tokens_returned=getattr(usage, "completion_tokens", None) or len(text.split()),
+            bytes_received=len(text.encode("utf-8")),
+        )
+        # only real answers are cached, errors fall through so the next click retries
+        llm_cache.set(key, text)
+        return text
         
     except Exception as e:
         print(f"Error generating content: {e}")
-        return f"Error: Unable to generate content. Please try again."
+        return GENERATION_ERROR
+
+
+def _stream(messages, config, key):
+    """Streaming chat completion; the full answer is cached once it is complete.
+
+    Raises if the stream can't be opened or breaks off, after yielding whatever arrived.
+    """
+    parts = []
+    try:
+        # only opening the stream is retried, once tokens are flowing a failure is final;
+        # the HF_CONCURRENCY slot is held until the last token
+        chunks = resilience.upstream("hf").call_stream(
+            get_client().chat_completion,
+            model=MODEL,
+            messages=messages,
+            max_tokens=config['max_tokens'],
+            temperature=config['temperature'],
+            top_p=config['top_p'],
+            stream=True,
+        )
+        for chunk in chunks:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                # one streamed chunk is one token
+                telemetry.record(tokens_returned=1, bytes_received=len(delta.encode("utf-8")))
+                parts.append(delta)
+                yield delta
+
+    except Exception as e:
+        print(f"Error streaming content after {len(parts)} chunks: {e}")
+        # a half-finished answer is never cached, and the caller must not mistake it for a whole one
+        raise
+
+    llm_cache.set(key, "".join(parts).strip())
 
 
 # TOOL FUNCTS
 
-def required_skills(job: str) -> list[str]:
+def required_skills(job: str, use_cache=True) -> list[str]:
     """extract required skills for a job role"""
     prompt = (
         f"List 8-12 core skills or technologies commonly required for a {job} position. "
         "Return ONLY a comma-separated list with no other text. "
         "Example format: Python, SQL, Data Analysis, Excel, Tableau, Machine Learning"
     )
-    raw = generate_content(prompt, task_type='skills')
+    raw = generate_content(prompt, task_type='skills', use_cache=use_cache)
     
     # parse comma-separated or newline-separated skills
     skills = [s.strip() for s in re.split(r",|\n|•|-", raw) if s.strip()]
@@ -90,8 +293,8 @@ def required_skills(job: str) -> list[str]:
     return skills[:12]  # Limit to 12 skills
 
 
-def sample_resume(job: str, skills: list[str]) -> str:
-    """generate a professional resume"""
+def sample_resume(job: str, skills: list[str], on_token=None, use_cache=True) -> str:
+    """generate a professional resume (streamed to on_token if given)"""
     skills_list = ', '.join(skills[:8])
     
     prompt = f"""Create a professional one-page resume in clean Markdown format for a {job} position.
@@ -131,11 +334,11 @@ State University | Graduated 2018
 
 Keep it professional and concise. Use proper Markdown formatting with ## for section headers."""
 
-    return generate_content(prompt, task_type='resume')
+    return generate_content(prompt, task_type='resume', on_token=on_token, use_cache=use_cache)
 
 
-def sample_cover(job: str, skills: list[str]) -> str:
-    """Generate a professional cover letter"""
+def sample_cover(job: str, skills: list[str], on_token=None, use_cache=True) -> str:
+    """Generate a professional cover letter (streamed to on_token if given)"""
     skills_list = ', '.join(skills[:5])
     
     prompt = f"""Write a professional cover letter for a {job} position (250-300 words).
@@ -161,87 +364,425 @@ John Doe
 
 Be professional, concise, and personable. Use plain text paragraphs, no special formatting or markdown."""
 
-    return generate_content(prompt, task_type='cover_letter')
+    return generate_content(prompt, task_type='cover_letter', on_token=on_token, use_cache=use_cache)
+
+
+# one JSON answer instead of three calls; LLM_BUNDLE=1 makes the planner use it
+BUNDLE_SCHEMA = """{
+  "skills": ["8-12 core skills or technologies"],
+  "resume": {
+    "contact": "Name | email | phone | linkedin",
+    "summary": "2-3 sentence professional summary",
+    "skills": ["6-8 key skills"],
+    "experience": [
+      {"title": "job title", "company": "company", "dates": "2021 - Present",
+       "highlights": ["2-3 achievements with quantifiable results"]}
+    ],
+    "education": "degree, school and graduation year"
+  },
+  "cover": {
+    "paragraphs": ["opening", "body", "closing"],
+    "signoff": "Sincerely,\nJohn Doe"
+  }
+}"""
+
+
+def generate_bundle(job: str, use_cache=True) -> dict:
+    """Skills, resume and cover letter from a single structured LLM call.
+
+    Returns {"skills", "resume", "cover", "resume_sections", "cover_sections"}
+    where resume/cover are the same Markdown the separate tools produce and the
+    *_sections dicts are ready to render. If the answer doesn't validate the
+    three separate calls are made instead.
+    """
+    prompt = f"""Prepare job application materials for a {job} position.
+
+Return ONLY a JSON object, no Markdown fences and no other text, with exactly this shape:
+{BUNDLE_SCHEMA}
+
+Use the placeholder candidate John Doe, john.doe@email.com, (555) 123-4567, linkedin.com/in/johndoe.
+Give two work experience entries (Senior {job} at ABC Corporation 2021 - Present, {job} at XYZ Company 2018 - 2021).
+The cover letter is 250-300 words of plain text over the three paragraphs."""
+
+    raw = generate_content(prompt, task_type='bundle', use_cache=use_cache)
+    try:
+        data = _validate_bundle(_extract_json(raw))
+    except ValueError as e:
+        print(f"Structured answer rejected ({e}), falling back to separate calls")
+        # don't keep serving the same broken answer from the cache
+        llm_cache.delete(_chat_request(prompt, 'bundle')[2])
+        skills = required_skills(job, use_cache)
+        resume, cover = sample_resume(job, skills, use_cache=use_cache), sample_cover(job, skills, use_cache=use_cache)
+        return {"skills": skills, "resume": resume, "cover": cover,
+                "resume_sections": None, "cover_sections": None}
+
+    resume_sections = {
+        "Contact": data["resume"]["contact"],
+        "Professional Summary": data["resume"]["summary"],
+        "Key Skills": "\n".join(f"- {s}" for s in data["resume"]["skills"]),
+        "Work Experience": "\n\n".join(
+            f"**{e['title']}** | {e['company']} | {e['dates']}\n" + "\n".join(f"- {h}" for h in e["highlights"])
+            for e in data["resume"]["experience"]
+        ),
+        "Education": data["resume"]["education"],
+    }
+    paragraphs = data["cover"]["paragraphs"]
+    cover_sections = {"Opening": paragraphs[0]}
+    if len(paragraphs) > 2:
+        cover_sections["Body"] = "\n\n".join(paragraphs[1:-1])
+    if len(paragraphs) > 1:
+        cover_sections["Closing"] = paragraphs[-1]
+    if data["cover"].get("signoff"):
+        cover_sections["Closing"] = cover_sections.get("Closing", "") + "\n\n" + data["cover"]["signoff"]
+
+    return {
+        "skills": data["skills"][:12],
+        "resume": "\n\n".join(f"## {name}\n{text}" for name, text in resume_sections.items()),
+        "cover": "\n\n".join(paragraphs + ([data["cover"]["signoff"]] if data["cover"].get("signoff") else [])),
+        "resume_sections": resume_sections,
+        "cover_sections": cover_sections,
+    }
+
+
+def _extract_json(raw: str):
+    """The outermost {...} in a model answer (models like to wrap JSON in fences)."""
+    start, end = raw.find("{"), raw.rfind("}")
+    if start < 0 or end < start:
+        raise ValueError("no JSON object in answer")
+    try:
+        return json.loads(raw[start:end + 1])
+    except json.JSONDecodeError as e:
+        raise ValueError(f"invalid JSON: {e}") from None
+
+
+def _validate_bundle(data):
+    """Check a bundle answer against BUNDLE_SCHEMA, raising ValueError on the first problem."""
+    def text(value, where):
+        if not isinstance(value, str) or not value.strip():
+            raise ValueError(f"{where} must be a non-empty string")
+        return value.strip()
+
+    def texts(value, where):
+        if not isinstance(value, list) or not value:
+            raise ValueError(f"{where} must be a non-empty list")
+        return [text(v, f"{where}[{i}]") for i, v in enumerate(value)]
+
+    if not isinstance(data, dict) or not isinstance(data.get("resume"), dict) or not isinstance(data.get("cover"), dict):
+        raise ValueError("expected an object with skills, resume and cover")
+    resume, cover = data["resume"], data["cover"]
+    experience = resume.get("experience")
+    if not isinstance(experience, list) or not experience or not all(isinstance(e, dict) for e in experience):
+        raise ValueError("resume.experience must be a non-empty list of objects")
+
+    return {
+        "skills": texts(data.get("skills"), "skills"),
+        "resume": {
+            "contact": text(resume.get("contact"), "resume.contact"),
+            "summary": text(resume.get("summary"), "resume.summary"),
+            "skills": texts(resume.get("skills"), "resume.skills"),
+            "experience": [
+                {"title": text(e.get("title"), f"resume.experience[{i}].title"),
+                 "company": text(e.get("company"), f"resume.experience[{i}].company"),
+                 "dates": text(e.get("dates"), f"resume.experience[{i}].dates"),
+                 "highlights": texts(e.get("highlights"), f"resume.experience[{i}].highlights")}
+                for i, e in enumerate(experience)
+            ],
+            "education": text(resume.get("education"), "resume.education"),
+        },
+        "cover": {
+            "paragraphs": texts(cover.get("paragraphs"), "cover.paragraphs"),
+            "signoff": text(cover["signoff"], "cover.signoff") if cover.get("signoff") else "",
+        },
+    }
 
 
-def search_jobs(query: str, location: str = "") -> list[dict]:
+def search_jobs(query: str, location: str = "", pages: int = 1, limit: int = 10,
+                use_cache: bool = True) -> list[JobListing]:
     """Search for job listings using RapidAPI"""
-    url = "https://jsearch.p.rapidapi.com/search"
+    return aio.run(search_jobs_async(query, location, pages, limit, use_cache))
+
+
+async def search_jobs_async(query: str, location: str = "", pages: int = 1, limit: int = 10,
+                            use_cache: bool = True) -> list[JobListing]:
+    """Search for job listings using RapidAPI over the shared connection pool
+
+    Results are cached under the normalised query. Entries older than
+    JOBS_CACHE_TTL are still served but refreshed in the background.
+    """
+    key = make_key("jobs", *normalize_query(query, location), pages, limit)
+    if use_cache:
+        entry = jobs_cache.get_entry(key)
+        telemetry.record(cache_hit=bool(entry))
+        if entry:
+            jobs, age = entry
+            jobs = [JobListing.from_dict(job) for job in jobs]
+            if age > JOBS_CACHE_TTL:
+                _refresh_jobs(key, query, location, pages, limit)
+            return jobs
+
+        if JOBS_ARCHIVE:
+            # listings fetched for other searches usually answer this one too;
+            # JSearch is still asked in the background so the archive stays fresh
+            archived = await asyncio.to_thread(_search_archive, query, location, limit or 10 * pages)
+            if len(archived) >= JOBS_ARCHIVE_MIN:
+                telemetry.record(cache_hit=True, archive_hits=len(archived))
+                _refresh_jobs(key, query, location, pages, limit)
+                return archived
+
+    jobs = await inflight.ado(key, _fetch_jobs, key, query, location, pages, limit)
+    if jobs is None:
+        return _no_jobs(query, location, failed=True)
+    return jobs if jobs else _no_jobs(query, location)
+
+
+# search results are fresh for JOBS_CACHE_TTL and then served stale for up to
+# JOBS_CACHE_STALE more seconds while a background refresh runs
+JOBS_CACHE_TTL = float(os.getenv("JOBS_CACHE_TTL", 6 * 3600))
+JOBS_CACHE_STALE = float(os.getenv("JOBS_CACHE_STALE", 24 * 3600))
+jobs_cache = Cache("job_searches", ttl=JOBS_CACHE_TTL + JOBS_CACHE_STALE, max_rows=2000)
+_refreshing = set()
+
+# every listing fetched is archived with a full-text index; a search with at least
+# JOBS_ARCHIVE_MIN archived matches is answered from there
+JOBS_ARCHIVE = os.getenv("JOBS_ARCHIVE", "1") != "0"
+JOBS_ARCHIVE_MIN = int(os.getenv("JOBS_ARCHIVE_MIN", 5))
+listing_archive = ListingArchive(max_age_days=float(os.getenv("JOBS_ARCHIVE_DAYS", 30)))
+
+LOCATION_ALIASES = {
+    "nyc": "new york", "new york city": "new york", "new york ny": "new york", "ny": "new york",
+    "sf": "san francisco", "san francisco ca": "san francisco", "bay area": "san francisco",
+    "la": "los angeles", "los angeles ca": "los angeles",
+    "dc": "washington dc", "washington d c": "washington dc",
+    "remote us": "remote", "anywhere": "remote",
+}
+
+
+def normalize_query(query: str, location: str = "") -> tuple[str, str]:
+    """Lowercase, collapse whitespace and canonicalise the location part of a search."""
+    query = re.sub(r"\s+", " ", query or "").strip().lower()
+    location = re.sub(r"\s+", " ", location or "").strip().lower()
+
+    # "software engineer in new york" carries its location in the query
+    if not location and " in " in query:
+        query, location = query.rsplit(" in ", 1)
+
+    location = re.sub(r"[^\w\s]", " ", location)
+    location = re.sub(r"\s+", " ", location).strip()
+    location = LOCATION_ALIASES.get(location, location)
+    return query.strip(), location
+
+
+async def _fetch_jobs(key, query, location, pages, limit) -> list[JobListing] | None:
+    """Hit JSearch and cache real results (never the _no_jobs placeholder); None if the search failed."""
+    try:
+        jobs = [job async for job in iter_jobs_async(query, location, pages=pages, limit=limit)]
+    except JobSearchFailed as e:
+        print(f"→ {e}")
+        return None
+    if jobs:
+        # cached with the descriptions still compressed
+        jobs_cache.set(key, [job.to_compact() for job in jobs])
+        if JOBS_ARCHIVE:
+            await asyncio.to_thread(_archive_jobs, jobs)
+    return jobs
+
+
+def _search_archive(query, location, limit) -> list[JobListing]:
+    try:
+        found = listing_archive.search(*normalize_query(query, location), limit=limit)
+        return [JobListing.from_dict(job) for job in found]
+    except Exception as e:
+        print(f"Error searching listing archive: {e}")
+        return []
+
+
+def _archive_jobs(jobs):
+    try:
+        listing_archive.add(jobs)
+    except Exception as e:
+        print(f"Error archiving listings: {e}")
+
+
+def _refresh_jobs(key, query, location, pages, limit):
+    """Re-fetch a stale search on the shared loop without making the caller wait."""
+    if key in _refreshing:
+        return
+    _refreshing.add(key)
+    future = asyncio.run_coroutine_threadsafe(
+        inflight.ado(key, _fetch_jobs, key, query, location, pages, limit), aio.get_loop()
+    )
+    future.add_done_callback(lambda _: _refreshing.discard(key))
+
+
+def iter_jobs(query: str, location: str = "", pages: int = 3, limit: int | None = None,
+              deadline: float | None = None):
+    """Yield job listings as each results page arrives (see iter_jobs_async)."""
+    return aio.iterate(iter_jobs_async(query, location, pages, limit, deadline))
+
+
+async def iter_jobs_async(query: str, location: str = "", pages: int = 3, limit: int | None = None,
+                          deadline: float | None = None):
+    """Fetch `pages` JSearch pages concurrently and yield unique listings as each page lands.
+
+    Stops after `limit` listings or `deadline` seconds, whichever comes first;
+    pages still in flight are cancelled. Raises JobSearchFailed if nothing was
+    found and a page failed (or the deadline passed), since that doesn't mean
+    there are no jobs.
+    """
+    loop = asyncio.get_running_loop()
+    stop_at = loop.time() + deadline if deadline else None
+    pending = {asyncio.create_task(_fetch_jobs_page(query, location, page)) for page in range(1, pages + 1)}
+    seen = set()
+    count = 0
+    failed = 0
+
+    try:
+        while pending:
+            timeout = max(stop_at - loop.time(), 0) if stop_at else None
+            done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                print("→ Job search deadline reached")
+                if not count:
+                    raise JobSearchFailed(f"Job search for '{query}' timed out")
+                return
+
+            for task in done:
+                page = task.result()
+                if page is None:
+                    failed += 1
+                    continue
+                for job in page:
+                    # the same listing often shows up on more than one page
+                    key = _job_key(job)
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    yield job
+                    count += 1
+                    if limit and count >= limit:
+                        return
+    finally:
+        for task in pending:
+            task.cancel()
+
+    if failed and not count:
+        raise JobSearchFailed(f"Job search for '{query}' failed ({failed} of {pages} pages)")
+
+
+class JobSearchFailed(Exception):
+    """JSearch couldn't be asked (errors, timeouts, open breaker), as opposed to finding nothing."""
+
+
+def _job_key(job: dict):
+    """De-duplication key: the apply link, or title + company if there isn't one."""
+    if job.get("url"):
+        return job["url"]
+    return (job.get("title", "").strip().lower(), job.get("company", "").strip().lower())
+
+
+def _normalize_job(item: dict) -> JobListing:
+    """Turn a raw JSearch item into the listing the app renders (cleaned once, here)."""
+    return JobListing.from_raw(item)
+
+
+async def _fetch_jobs_page(query: str, location: str, page: int) -> list[JobListing] | None:
+    """Fetch one page of JSearch results, [] if it has none and None on any error."""
+    url = JSEARCH_URL
     headers = {
-        "x-rapidapi-key": RAPIDAPI_KEY,
+        "x-rapidapi-key": get_secret("RAPIDAPI_KEY") or "",
         "x-rapidapi-host": "jsearch.p.rapidapi.com",
     }
     search_query = f"{query}{' in ' + location if location else ''}"
     
     querystring = {
         "query": search_query,
-        "page": "1",
+        "page": str(page),
         "num_pages": "1",
         "country": "us",
         "date_posted": "all"
     }
 
     try:
-        resp = requests.get(url, headers=headers, params=querystring, timeout=10)
+        async def request():
+            resp = await aio.get_client(url).get(url, headers=headers, params=querystring)
+            telemetry.record(bytes_received=len(resp.content))
+            return resilience.check_response("jsearch", resp)
+
+        resp = await resilience.upstream("jsearch").acall(request)
         
         if resp.status_code == 404:
             print(f"Error: Invalid endpoint - {resp.json().get('message', 'Not found')}")
-            return _no_jobs(query, location)
+            return None
         elif resp.status_code == 401:
             print("Error: Invalid API key or unauthorized access")
-            return _no_jobs(query, location)
+            return None
         elif resp.status_code == 403:
             print("Error: API access forbidden")
-            return _no_jobs(query, location)
+            return None
         
         if resp.status_code != 200 or not resp.text.strip():
             print(f"→ Non-200 ({resp.status_code}) or empty response")
-            return _no_jobs(query, location)
+            return None
             
         data = resp.json()
         lst = data.get("data", [])
         
         if not isinstance(lst, list):
             print("→ Response format invalid, expected list")
-            return _no_jobs(query, location)
+            return None
         
-        jobs = []
-        for item in lst[:10]:
-            jobs.append({
-                "title": item.get("job_title", "Unknown Position"),
-                "company": item.get("employer_name", "Unknown Company"),
-                "location": item.get("job_location", "Location not specified"),
-                "description": item.get("job_description", "No description available"),
-                "url": item.get("job_apply_link", ""),
-                "date_posted": item.get("job_posted_at_datetime_utc", "")[:10] if item.get("job_posted_at_datetime_utc") else "",
-                "salary": item.get("job_salary", "")
-            })
-        
-        return jobs if jobs else _no_jobs(query, location)
+        return [_normalize_job(item) for item in lst]
         
-    except requests.exceptions.Timeout:
+    except httpx.TimeoutException:
         print("Error: Request timed out")
-        return _no_jobs(query, location)
+        return None
     except Exception as e:
         print(f"Error searching for jobs: {e}")
-        return _no_jobs(query, location)
+        return None
+
+
+def _no_jobs(query: str, location: str = "", failed: bool = False) -> list[JobListing]:
+    """Return empty job result (an "Error:" one if the search couldn't be run)"""
+    if failed:
+        return [JobListing(
+            title="Error: Job search is unavailable right now",
+            company="",
+            location="Please try again in a few minutes",
+            description="The job search service didn't answer. Nothing was found or cached for this search.",
+        )]
+    return [JobListing(
+        title=f"No jobs found for '{query}'{' in ' + location if location else ''}",
+        company="",
+        location=location if location else "Try different search terms",
+        description="No job listings matched your search criteria. Try:\n- Broadening your search terms\n- Different locations\n- Related job titles",
+    )]
+
+
+def search_posts(job_title, company="", location="", parallel=None, stagger=None):
+    """Search for industry posts and discussions using SerpAPI (still uses Google Search API) instead of Google CSE since it's denying me permission to use it :(."""
+    return aio.run(search_posts_async(job_title, company, location, parallel, stagger))
 
 
-def _no_jobs(query: str, location: str = "") -> list[dict]:
-    """Return empty job result"""
-    return [{
-        "title": f"No jobs found for '{query}'{' in ' + location if location else ''}",
-        "company": "",
-        "location": location if location else "Try different search terms",
-        "description": "No job listings matched your search criteria. Try:\n- Broadening your search terms\n- Different locations\n- Related job titles",
-        "url": "",
-        "date_posted": "",
-        "salary": ""
-    }]
+# POSTS_PARALLEL=1 fires all query variants at once instead of one after another; with
+# a stagger each broader variant waits that long (or until the previous one comes back
+# empty). Off by default: a cancelled variant has usually been sent, and billed, already
+POSTS_PARALLEL = os.getenv("POSTS_PARALLEL", "0") != "0"
+POSTS_STAGGER = float(os.getenv("POSTS_STAGGER", 0.0))
 
 
-def search_posts(job_title, company="", location=""):
-    """Search for industry posts and discussions using SerpAPI (still uses Google Search API) instead of Google CSE since it's denying me permission to use it :(."""
+async def search_posts_async(job_title, company="", location="", parallel=None, stagger=None):
+    """Search for industry posts using SerpAPI over the shared connection pool
+
+    Returns the results of the most specific query variant that finds anything,
+    [] if none does, or None if no variant could be searched at all.
+    """
+    parallel = POSTS_PARALLEL if parallel is None else parallel
+    stagger = POSTS_STAGGER if stagger is None else stagger
+    key = make_key("posts", job_title, company, location, parallel, stagger)
+    return await inflight.ado(key, _search_posts, job_title, company, location, parallel, stagger)
+
+
+async def _search_posts(job_title, company, location, parallel, stagger):
     attempts = []
     if job_title and company and location:
         attempts.append([job_title, company, location])
@@ -252,66 +793,171 @@ def search_posts(job_title, company="", location=""):
     if job_title:
         attempts.append([job_title])
 
-    synonyms = "(career OR trends OR tips OR advice OR news OR discussion)"
+    if not parallel or len(attempts) < 2:
+        answered = False
+        for terms in attempts:
+            posts = await _fetch_posts(terms)
+            if posts:
+                return posts
+            answered = answered or posts is not None
+        return [] if answered else None
 
-    for terms in attempts:
-        query = " ".join(terms + [synonyms])
+    tasks = []
 
-        url = "https://serpapi.com/search"
-        params = {
-            "engine": "google",
-            "q": query,
-            "num": 5,
-            "api_key": SERPAPI_KEY
-        }
+    async def attempt(i, terms):
+        if i and stagger:
+            await asyncio.wait([tasks[i - 1]], timeout=stagger)
+        return await _fetch_posts(terms)
 
-        #  try to fetch search results from SerpAPI
-        try:
-            resp = requests.get(url, params=params, timeout=10)
-            data = resp.json()
-
-            if "error" in data:
-                print("SerpAPI Error:", data["error"])
-                continue
-            posts = []
-            for item in data.get("organic_results", []):
-                posts.append({
-                    "title": item.get("title", "No title"),
-                    "link": item.get("link", ""),
-                    "snippet": item.get("snippet", "No description available")
-                })
+    for i, terms in enumerate(attempts):
+        tasks.append(asyncio.create_task(attempt(i, terms)))
 
+    try:
+        # attempts are ordered most specific first, so the first hit in order wins
+        answered = False
+        for task in tasks:
+            posts = await task
             if posts:
                 return posts
+            answered = answered or posts is not None
+        return [] if answered else None
+    finally:
+        for task in tasks:
+            task.cancel()
 
-        except Exception as e:
-            print(f"Error searching SerpAPI: {e}")
-            continue
 
-    return []
+async def _fetch_posts(terms) -> list[dict] | None:
+    """Run one SerpAPI query variant, [] if it finds nothing and None if it fails."""
+    synonyms = "(career OR trends OR tips OR advice OR news OR discussion)"
+    query = " ".join(terms + [synonyms])
+
+    url = SERPAPI_URL
+    params = {
+        "engine": "google",
+        "q": query,
+        "num": 5,
+        "api_key": get_secret("SERPAPI_KEY")
+    }
+
+    #  try to fetch search results from SerpAPI
+    try:
+        async def request():
+            resp = await aio.get_client(url).get(url, params=params)
+            telemetry.record(bytes_received=len(resp.content))
+            return resilience.check_response("serpapi", resp)
+
+        resp = await resilience.upstream("serpapi").acall(request)
+        data = resp.json()
+
+        if "error" in data:
+            print("SerpAPI Error:", data["error"])
+            # "no results" comes back as an error message too
+            return [] if "hasn't returned any results" in str(data["error"]) else None
+        posts = []
+        for item in data.get("organic_results", []):
+            posts.append({
+                "title": item.get("title", "No title"),
+                "link": item.get("link", ""),
+                "snippet": item.get("snippet", "No description available")
+            })
+        return posts
+
+    except Exception as e:
+        print(f"Error searching SerpAPI: {e}")
+        return None
+
+
+# the jobs tool fetches JOB_PAGES pages, ranks them against the goal and keeps the best JOB_RESULTS
+JOB_PAGES = int(os.getenv("JOB_PAGES", 1))
+JOB_RESULTS = int(os.getenv("JOB_RESULTS", 10))
+
+
+# LLM tools can reuse what was generated for a goal that means the same thing
+SEMANTIC_CACHE = os.getenv("SEMANTIC_CACHE", "1") != "0"
+semantic_cache = SemanticCache(threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", 0.9)))
+# hit rate and similarity histogram on the metrics endpoint, for tuning the threshold
+telemetry.add_collector(semantic_cache.to_prometheus)
+
+
+def _is_error(value) -> bool:
+    if isinstance(value, str):
+        return value.startswith("Error:")
+    if isinstance(value, dict):
+        value = value.values()
+    return any(isinstance(v, str) and v.startswith("Error:") for v in value)
+
+
+def _semantic(tool, goal, produce, on_token=None, use_cache=True):
+    """Serve a tool's output from a similar earlier goal, or produce it and remember it.
+
+    With use_cache=False the lookup is skipped but the new output is still stored.
+    """
+    if not SEMANTIC_CACHE:
+        return produce()
+    try:
+        hit = semantic_cache.lookup(tool, goal) if use_cache else None
+    except Exception as e:
+        print(f"Semantic cache unavailable: {e}")
+        return produce()
+
+    if hit:
+        telemetry.record(cache_hit=True, semantic_similarity=round(hit[1], 3))
+        value = hit[0]
+        if on_token is not None:
+            on_token(value)
+        return value
+
+    value = produce()
+    if not _is_error(value):
+        try:
+            semantic_cache.store(tool, goal, value)
+        except Exception as e:
+            print(f"Error storing in semantic cache: {e}")
+    return value
 
 
 # THE HANDYMAN
-def use_tool(name, *, memory, goal):
-    """ Use specified tool to perform task based on the category and update memory  """
+def use_tool(name, *, memory, goal, on_token=None, use_cache=True):
+    """ Use specified tool to perform task based on the category and update memory
+
+    on_token receives streamed text chunks from the resume and cover tools.
+    use_cache=False skips the LLM, semantic and job search caches (an explicit refresh).
+    Each call is timed as a telemetry span named "tool". """
+    with telemetry.span("tool", tool=name):
+        return _run_tool(name, memory=memory, goal=goal, on_token=on_token, use_cache=use_cache)
+
+
+def _run_tool(name, *, memory, goal, on_token=None, use_cache=True):
     
     if name == "skills":
-        memory["skills"] = required_skills(goal)
+        memory["skills"] = _semantic("skills", goal, lambda: required_skills(goal, use_cache), use_cache=use_cache)
         return memory["skills"]
 
     if name == "resume":
-        skills = memory.get("skills") or required_skills(goal)
-        memory["resume"] = sample_resume(goal, skills)
+        def produce():
+            skills = memory.get("skills") or required_skills(goal, use_cache)
+            return sample_resume(goal, skills, on_token=on_token, use_cache=use_cache)
+        memory["resume"] = _semantic("resume", goal, produce, on_token, use_cache)
         return memory["resume"]
 
     if name == "cover":
-        skills = memory.get("skills") or required_skills(goal)
-        memory["cover"] = sample_cover(goal, skills)
+        def produce():
+            skills = memory.get("skills") or required_skills(goal, use_cache)
+            return sample_cover(goal, skills, on_token=on_token, use_cache=use_cache)
+        memory["cover"] = _semantic("cover", goal, produce, on_token, use_cache)
         return memory["cover"]
+
+    if name == "bundle":
+        # skills, resume and cover from one structured answer (nothing to stream, it's JSON)
+        bundle = _semantic("bundle", goal, lambda: generate_bundle(goal, use_cache), use_cache=use_cache)
+        memory.update(bundle)
+        return bundle
         
     if name == "jobs":
         location = memory.get("location", "")
-        memory["jobs"] = search_jobs(goal, location)
+        jobs = search_jobs(goal, location, pages=JOB_PAGES, limit=None, use_cache=use_cache)
+        # ranked by goal only, the search doesn't wait for the skills task
+        memory["jobs"] = ranker.rank_jobs(jobs, goal)[:JOB_RESULTS]
         return memory["jobs"]
     
     if name == "posts":
@@ -321,4 +967,31 @@ def use_tool(name, *, memory, goal):
         memory["posts"] = search_posts(job, company, location)
         return memory["posts"]
 
-    raise ValueError(f"Unknown tool: {name}")
\ No newline at end of file
+    raise ValueError(f"Unknown tool: {name}")
+
+async def use_tool_async(name, *, memory, goal, on_token=None, use_cache=True):
+    """ Async version of use_tool: searches run on the event loop, LLM tools in a thread """
+    if name not in ("jobs", "posts"):
+        return await asyncio.to_thread(use_tool, name, memory=memory, goal=goal, on_token=on_token,
+                                       use_cache=use_cache)
+
+    with telemetry.span("tool", tool=name):
+        return await _run_search_tool(name, memory=memory, goal=goal, use_cache=use_cache)
+
+
+async def _run_search_tool(name, *, memory, goal, use_cache=True):
+    if name == "jobs":
+        location = memory.get("location", "")
+        jobs = await search_jobs_async(goal, location, pages=JOB_PAGES, limit=None, use_cache=use_cache)
+        # embedding is CPU work, keep it off the event loop
+        ranked = await asyncio.to_thread(ranker.rank_jobs, jobs, goal)
+        memory["jobs"] = ranked[:JOB_RESULTS]
+        return memory["jobs"]
+
+    if name == "posts":
+        company = memory.get("company", "")
+        location = memory.get("location", "")
+        memory["posts"] = await search_posts_async(goal, company, location)
+        return memory["posts"]
+
+    raise ValueError(f"Unknown tool: {name}")
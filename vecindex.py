@@ -0,0 +1,117 @@
+"""
+In-process exact vector index backed by a memory-mapped .npy file.
+
+Rows are L2-normalised float32 embeddings; `ids.txt` holds one id per row.
+Opening the index is just an mmap, a query is one matrix product, and
+appends write into spare capacity (the file only grows, by doubling).
+"""
+from __future__ import annotations
+import os, pathlib, threading
+import numpy as np
+
+
+class NumpyIndex:
+    """Exact top-k search over normalised embeddings."""
+
+    def __init__(self, directory, initial_capacity: int = 1024):
+        self.dir = pathlib.Path(directory)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.vectors_path = self.dir / "vectors.npy"
+        self.ids_path = self.dir / "ids.txt"
+        self.initial_capacity = initial_capacity
+        self._lock = threading.Lock()
+
+        # the id file is the source of truth for how many rows are valid: vectors
+        # are written first, so an interrupted append just leaves unused rows
+        self.ids: list[str] = []
+        if self.ids_path.exists():
+            self.ids = self.ids_path.read_text(encoding="utf-8").split()
+
+        self._mm = None
+        if self.vectors_path.exists():
+            self._mm = np.load(self.vectors_path, mmap_mode="r+")
+        rows = 0 if self._mm is None else self._mm.shape[0]
+        if len(self.ids) > rows:
+            # ids without vectors (e.g. vectors.npy was deleted): drop them, and from the
+            # file too, or the next append would line its vectors up with the wrong ids
+            self.ids = self.ids[:rows]
+            self.ids_path.write_text("".join(cid + "\n" for cid in self.ids), encoding="utf-8")
+        self._id_set = set(self.ids)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, cid: str) -> bool:
+        return cid in self._id_set
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """View of the valid rows (no copy)."""
+        if self._mm is None:
+            return np.empty((0, 0), dtype=np.float32)
+        return self._mm[:len(self.ids)]
+
+    def _reserve(self, rows: int, dim: int):
+        """Make room for `rows` more vectors, rewriting the file only when it is full."""
+        n = len(self.ids)
+        capacity = 0 if self._mm is None else self._mm.shape[0]
+        if self._mm is not None and self._mm.shape[1] != dim:
+            raise ValueError(f"Index holds {self._mm.shape[1]}-d vectors, got {dim}-d")
+        if n + rows <= capacity:
+            return
+
+        new_capacity = max(capacity * 2, n + rows, self.initial_capacity)
+        tmp = self.vectors_path.with_suffix(".tmp.npy")
+        grown = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.float32, shape=(new_capacity, dim))
+        if n:
+            grown[:n] = self._mm[:n]
+        grown.flush()
+        del grown
+        self._mm = None
+        os.replace(tmp, self.vectors_path)
+        self._mm = np.load(self.vectors_path, mmap_mode="r+")
+
+    def add(self, ids, vectors) -> int:
+        """Append vectors for ids not in the index yet, returns how many were added."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._lock:
+            keep = [i for i, cid in enumerate(ids) if cid not in self._id_set]
+            if not keep:
+                return 0
+            ids = [ids[i] for i in keep]
+            vectors = _normalize(vectors[keep])
+
+            n = len(self.ids)
+            self._reserve(len(ids), vectors.shape[1])
+            self._mm[n:n + len(ids)] = vectors
+            self._mm.flush()
+            with open(self.ids_path, "a", encoding="utf-8") as f:
+                f.write("".join(cid + "\n" for cid in ids))
+            self.ids.extend(ids)
+            self._id_set.update(ids)
+            return len(ids)
+
+    def search(self, queries, k: int = 5):
+        """Return (ids, cosine similarities) of the top-k rows for each query, best first."""
+        queries = _normalize(np.atleast_2d(np.asarray(queries, dtype=np.float32)))
+        with self._lock:
+            # an add may grow (remap) the file while we search; this view keeps the
+            # mapping it came from alive, and rows already in it never change
+            n = len(self.ids)
+            vectors = self.vectors
+        if n == 0:
+            return [[] for _ in queries], np.empty((len(queries), 0), dtype=np.float32)
+
+        k = min(k, n)
+        sims = queries @ vectors.T  # (queries, rows), one BLAS call
+        top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        top_sims = np.take_along_axis(sims, top, axis=1)
+        order = np.argsort(-top_sims, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_sims = np.take_along_axis(top_sims, order, axis=1)
+        return [[self.ids[j] for j in row] for row in top], top_sims
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
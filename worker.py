@@ -0,0 +1,313 @@
+"""
+Run agents out of process, fed from a job queue in SQLite.
+
+    python worker.py --processes 4 --threads 2
+
+The web tier calls `submit(goal)` and then polls `follow(job_id)` for the
+agent's events (plan, per-tool results, steps, streamed text, finish) while
+a pool of worker processes claims queued jobs and runs `run_agent` for them.
+No broker is needed, just a SQLite file every process can reach
+(AGENT_QUEUE_DB), so workers scale across cores independently of Streamlit.
+"""
+from __future__ import annotations
+import argparse, json, multiprocessing, os, pathlib, signal, socket, sqlite3, sys, threading, time
+from listing import JobListing
+
+QUEUE_DB = pathlib.Path(os.getenv("AGENT_QUEUE_DB", ".queue_jobassistant.sqlite"))
+JOB_TIMEOUT = float(os.getenv("AGENT_JOB_TIMEOUT", 300))   # a running job older than this is requeued
+MAX_ATTEMPTS = 3
+KEEP_SECONDS = 24 * 3600                                    # finished jobs and their events are kept this long
+TOKEN_FLUSH = 0.3                                           # seconds of streamed text per event row
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    goal TEXT NOT NULL,
+    cached INTEGER NOT NULL,
+    status TEXT NOT NULL,               -- queued, running, done, failed
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    submitted_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    result TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id);
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    job_id INTEGER NOT NULL,
+    attempt INTEGER NOT NULL DEFAULT 1, -- the jobs.attempts value of the run that published it
+    data TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_job ON events (job_id, id);
+"""
+
+
+def _encode(obj):
+    # listings travel with their descriptions still compressed
+    if isinstance(obj, JobListing):
+        return obj.to_compact()
+    return str(obj)
+
+
+def _decode_jobs(value):
+    if isinstance(value, list):
+        return [JobListing.from_dict(job) if isinstance(job, dict) and "description_z" in job else job
+                for job in value]
+    return value
+
+
+class JobQueue:
+    """The jobs and events tables, with one connection per thread."""
+
+    def __init__(self, path=QUEUE_DB):
+        self.path = str(path)
+        self._local = threading.local()
+
+    def _conn(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            # autocommit, transactions are opened explicitly where they matter
+            db = self._local.db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.executescript(SCHEMA)
+            if "attempt" not in [row[1] for row in db.execute("PRAGMA table_info(events)")]:
+                db.execute("ALTER TABLE events ADD COLUMN attempt INTEGER NOT NULL DEFAULT 1")
+        return db
+
+    # web side
+
+    def submit(self, goal: str, cached: bool = True) -> int:
+        cur = self._conn().execute(
+            "INSERT INTO jobs (goal, cached, status, submitted_at) VALUES (?, ?, 'queued', ?)",
+            (goal, int(cached), time.time()),
+        )
+        return cur.lastrowid
+
+    def status(self, job_id: int) -> dict:
+        row = self._conn().execute(
+            "SELECT status, result, error, worker, attempts FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        if row is None:
+            raise KeyError(f"No such job: {job_id}")
+        result = json.loads(row[1]) if row[1] else None
+        if result is not None:
+            result["jobs"] = _decode_jobs(result.get("jobs"))
+        return {"status": row[0], "result": result, "error": row[2], "worker": row[3], "attempt": row[4]}
+
+    def cancel(self, job_id: int, error: str):
+        """Fail a job that hasn't finished (a worker still running it can no longer publish or finish)."""
+        self._conn().execute(
+            "UPDATE jobs SET status = 'failed', error = ?, finished_at = ? "
+            "WHERE id = ? AND status IN ('queued', 'running')",
+            (error, time.time(), job_id),
+        )
+
+    def events(self, job_id: int, after: int = 0, attempt: int | None = None) -> list[tuple[int, dict]]:
+        """(event id, event) for every event of the job after `after`, only from `attempt` if given."""
+        sql, params = "SELECT id, data FROM events WHERE job_id = ? AND id > ?", [job_id, after]
+        if attempt is not None:
+            sql += " AND attempt = ?"
+            params.append(attempt)
+        rows = self._conn().execute(sql + " ORDER BY id", params).fetchall()
+        out = []
+        for event_id, data in rows:
+            event = json.loads(data)
+            if event.get("type") == "result" and event.get("tool") == "jobs":
+                event["output"] = _decode_jobs(event["output"])
+            out.append((event_id, event))
+        return out
+
+    def follow(self, job_id: int, poll: float = 0.2, timeout: float | None = None,
+               claim_timeout: float | None = None):
+        """Yield the job's events as they're published, until it is done or failed.
+
+        Only the current attempt's events are yielded; when a timed out job is
+        picked up again a {"type": "retry"} event says to throw away what the
+        earlier attempt drew. Raises TimeoutError after `timeout` seconds, or
+        after `claim_timeout` seconds if no worker has picked the job up yet.
+        """
+        after, attempt = 0, None
+        started = time.monotonic()
+        deadline = started + timeout if timeout else None
+        while True:
+            state = self.status(job_id)
+            if state["attempt"] != attempt:
+                if attempt:
+                    yield {"type": "retry", "attempt": state["attempt"]}
+                attempt = state["attempt"]
+            for after, event in self.events(job_id, after, attempt):
+                yield event
+            if state["status"] in ("done", "failed"):
+                return
+            if claim_timeout is not None and not state["attempt"] and time.monotonic() - started > claim_timeout:
+                raise TimeoutError(f"no worker picked up the job within {claim_timeout:.0f}s")
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError(f"no result after {timeout:.0f}s")
+            time.sleep(poll)
+
+    # worker side
+
+    def claim(self, worker: str):
+        """Take the oldest queued job as `worker`; returns (id, goal, cached, attempt) or None."""
+        db = self._conn()
+        now = time.time()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            # a worker that died mid-run leaves its job running forever; give it to someone else
+            # (if it is only slow, its attempt no longer matches and its events and result are dropped)
+            db.execute(
+                "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END, "
+                "error = CASE WHEN attempts >= ? THEN 'worker timed out' ELSE error END, "
+                "finished_at = CASE WHEN attempts >= ? THEN ? ELSE finished_at END "
+                "WHERE status = 'running' AND started_at < ?",
+                (MAX_ATTEMPTS, MAX_ATTEMPTS, MAX_ATTEMPTS, now, now - JOB_TIMEOUT),
+            )
+            row = db.execute(
+                "SELECT id, goal, cached, attempts + 1 FROM jobs WHERE status = 'queued' ORDER BY id LIMIT 1"
+            ).fetchone()
+            if row is not None:
+                db.execute(
+                    "UPDATE jobs SET status = 'running', worker = ?, started_at = ?, attempts = attempts + 1 "
+                    "WHERE id = ?",
+                    (worker, now, row[0]),
+                )
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return (row[0], row[1], bool(row[2]), row[3]) if row else None
+
+    # publish and finish only do anything while `attempt` still owns the running job,
+    # so a worker whose job timed out (or was cancelled) can't write into its retry
+
+    def publish(self, job_id: int, attempt: int, event: dict):
+        self._conn().execute(
+            "INSERT INTO events (job_id, attempt, data, created_at) SELECT ?, ?, ?, ? "
+            "WHERE EXISTS (SELECT 1 FROM jobs WHERE id = ? AND status = 'running' AND attempts = ?)",
+            (job_id, attempt, json.dumps(event, ensure_ascii=False, default=_encode), time.time(),
+             job_id, attempt),
+        )
+
+    def finish(self, job_id: int, attempt: int, result=None, error: str | None = None) -> bool:
+        """Record the outcome; False if the job was no longer this attempt's."""
+        cur = self._conn().execute(
+            "UPDATE jobs SET status = ?, finished_at = ?, result = ?, error = ? "
+            "WHERE id = ? AND status = 'running' AND attempts = ?",
+            ("failed" if error else "done", time.time(),
+             json.dumps(result, ensure_ascii=False, default=_encode) if result is not None else None,
+             error, job_id, attempt),
+        )
+        return cur.rowcount == 1
+
+    def prune(self, older_than: float = KEEP_SECONDS):
+        """Drop finished jobs (and their events) older than `older_than` seconds."""
+        cutoff = time.time() - older_than
+        db = self._conn()
+        db.execute("DELETE FROM events WHERE job_id IN (SELECT id FROM jobs WHERE finished_at < ?)", (cutoff,))
+        db.execute("DELETE FROM jobs WHERE finished_at < ?", (cutoff,))
+
+
+class _TokenBuffer:
+    """Collect streamed chunks and publish them as one event per tool every TOKEN_FLUSH seconds."""
+
+    def __init__(self, publish):
+        self.publish = publish
+        self.parts: dict[str, list] = {}
+        self.flushed = time.monotonic()
+
+    def add(self, tool, chunk):
+        self.parts.setdefault(tool, []).append(chunk)
+        if time.monotonic() - self.flushed >= TOKEN_FLUSH:
+            self.flush()
+
+    def flush(self):
+        for tool, parts in self.parts.items():
+            if parts:
+                self.publish({"type": "tokens", "tool": tool, "text": "".join(parts)})
+        self.parts = {}
+        self.flushed = time.monotonic()
+
+
+def run_job(queue: JobQueue, job_id: int, goal: str, cached: bool, attempt: int = 1):
+    import agent  # only workers need the tools loaded
+
+    tokens = _TokenBuffer(lambda event: queue.publish(job_id, attempt, event))
+
+    def on_event(event):
+        tokens.flush()  # streamed text always lands before the result it belongs to
+        queue.publish(job_id, attempt, event)
+
+    try:
+        # an uncached job is a refresh, it skips the tools' caches too
+        result = agent.run_agent(goal, log=None, stream=tokens.add, on_event=on_event,
+                                 cached=cached, use_cache=cached)
+    except Exception as e:
+        tokens.flush()
+        queue.finish(job_id, attempt, error=f"{type(e).__name__}: {e}")
+        print(f"Error running agent job {job_id}: {e}")
+        return
+    if not queue.finish(job_id, attempt, result):
+        print(f"Agent job {job_id} was given to another worker or cancelled, result dropped")
+
+
+def work(path=QUEUE_DB, name: str | None = None, poll: float = 0.5, stop: threading.Event | None = None):
+    """Claim and run jobs until `stop` is set."""
+    queue = JobQueue(path)
+    name = name or f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+    stop = stop or threading.Event()
+    pruned = 0.0
+    while not stop.is_set():
+        job = queue.claim(name)
+        if job is None:
+            if time.time() - pruned > 3600:
+                queue.prune()
+                pruned = time.time()
+            stop.wait(poll)
+            continue
+        run_job(queue, *job)
+
+
+def _process(path, threads: int, poll: float):
+    """One worker process running `threads` agents at a time."""
+    workers = [threading.Thread(target=work, args=(path, None, poll), daemon=True) for _ in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run agent jobs from the queue in worker processes.")
+    parser.add_argument("--db", default=str(QUEUE_DB), help="queue database (AGENT_QUEUE_DB)")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--threads", type=int, default=2, help="agents running at the same time per process")
+    parser.add_argument("--poll", type=float, default=0.5, help="seconds between checks of an empty queue")
+    args = parser.parse_args(argv)
+
+    JobQueue(args.db)._conn()  # create the tables before the workers race to
+    # spawn, not fork: the parent may already have started threads (event loops, pools)
+    ctx = multiprocessing.get_context("spawn")
+    procs = [ctx.Process(target=_process, args=(args.db, args.threads, args.poll), name=f"agent-worker-{i}")
+             for i in range(args.processes)]
+    for p in procs:
+        p.start()
+    print(f"{args.processes} worker processes x {args.threads} agents on {args.db}")
+    # stopping the parent (Ctrl-C or a service manager's SIGTERM) stops the workers too;
+    # jobs they were running are requeued after AGENT_JOB_TIMEOUT
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        for p in procs:
+            p.join()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        for p in procs:
+            p.terminate()
+
+
+if __name__ == "__main__":
+    main()